@@ -0,0 +1,437 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import timeit
+import tracemalloc
+
+import numpy as np
+
+from generate_dataset import (
+    DEFAULT_BATCH_SIZE,
+    LEVELS,
+    TEMPLATES,
+    build_batch_frame,
+    compile_level,
+    create_indonesian_literacy_dataset,
+    generate_wrong_answers,
+    generate_wrong_answers_batch,
+    iter_literacy_batches,
+    parse_levels,
+    render_batch,
+    render_texts,
+    sample_option_indices,
+    save_dataset,
+    write_dataset_stream,
+)
+
+SCALES = (1000, 100000, 1000000)
+
+STAGES = (
+    'sample', 'render', 'distractors', 'dataframe', 'write', 'end_to_end',
+    'create', 'wrong_answers', 'save_csv', 'save_partitioned'
+)
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_baseline.json')
+
+# Relative slowdown or memory growth over the baseline that counts as a regression
+DEFAULT_TOLERANCE = 0.2
+
+# Peak memory changes below this many MB are noise, not regressions
+MEMORY_NOISE_MB = 1.0
+
+# Each case is timed as the best of at least this many runs, repeated
+# until the runs add up to MIN_CASE_SECONDS, so one noisy run is not a regression
+DEFAULT_REPEAT = 3
+MIN_CASE_SECONDS = 1.0
+
+# Cases that look slower than the baseline are timed again for up to this
+# many seconds each; shared machines have slow spells that outlast a few runs
+CONFIRM_SECONDS = 30.0
+
+# A saved baseline is the median of this many best-of timings per case, so
+# one unusually fast run does not become the bar every later run must reach
+BASELINE_WINDOWS = 5
+
+def render_with_replace(template, chosen_vars):
+    """Previous rendering path: one str.replace per variable on text and summary"""
+    text = template["text"]
+    summary = template["summary"]
+    for var, value in chosen_vars.items():
+        text = text.replace(f"{{{var}}}", value)
+        summary = summary.replace(f"{{{var}}}", value)
+    return text, summary
+
+def bench_template_rendering(rows=20000, repeat=5):
+    """Compare chained str.replace with the compiled template engine per level"""
+
+    results = []
+
+    for level in LEVELS:
+        raw = TEMPLATES[level]["templates"][0]
+        compiled = compile_level(level)[0]
+
+        # Pre-draw the bindings so only rendering is timed
+        rng = random.Random(level)
+        bindings = [[rng.choice(options) for options in compiled.options] for _ in range(rows)]
+        chosen = [dict(zip(compiled.names, values)) for values in bindings]
+
+        # Both paths must produce the same strings
+        for values, chosen_vars in zip(bindings[:100], chosen[:100]):
+            expected = render_with_replace(raw, chosen_vars)
+            assert expected == (compiled.text.render(values), compiled.summary.render(values))
+
+        def run_replace():
+            for chosen_vars in chosen:
+                render_with_replace(raw, chosen_vars)
+
+        def run_compiled():
+            text, summary = compiled.text, compiled.summary
+            for values in bindings:
+                text.render(values)
+                summary.render(values)
+
+        replace_time = min(timeit.repeat(run_replace, number=1, repeat=repeat))
+        compiled_time = min(timeit.repeat(run_compiled, number=1, repeat=repeat))
+
+        results.append({
+            'level': level,
+            'slots': len(compiled.names),
+            'replace_us_per_row': replace_time / rows * 1e6,
+            'compiled_us_per_row': compiled_time / rows * 1e6,
+            'speedup': replace_time / compiled_time
+        })
+
+    return results
+
+def chunk_sizes(n, batch_size=DEFAULT_BATCH_SIZE):
+    """Sizes of the batches a run over n rows is split into"""
+    return [min(batch_size, n - start) for start in range(0, n, batch_size)]
+
+def run_stage(stage, level, n, path, seed=0):
+    """Run one stage over n rows of a level, return (rows, seconds spent in the stage)
+
+    Stages run batch by batch like the generator does; the inputs of a
+    stage are produced by the stages before it but are not timed. The
+    create, wrong_answers and save_* stages time the public functions
+    create_indonesian_literacy_dataset, generate_wrong_answers and
+    save_dataset directly.
+    """
+
+    rng = np.random.default_rng(seed)
+    topics = TEMPLATES[level]["topics"]
+    questions_per_topic = -(-n // len(topics))
+
+    # Public entry points, called the way scripts call them
+    if stage == 'create':
+        start = time.perf_counter()
+        dataset = create_indonesian_literacy_dataset(questions_per_topic, (level,), seed=seed)
+        return len(dataset), time.perf_counter() - start
+
+    if stage in ('save_csv', 'save_partitioned'):
+        dataset = create_indonesian_literacy_dataset(questions_per_topic, (level,), seed=seed)
+        workdir = os.path.dirname(path)
+        previous = os.getcwd()
+        # save_dataset writes CSVs to the working directory and reports on stdout
+        os.chdir(workdir)
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                start = time.perf_counter()
+                if stage == 'save_csv':
+                    save_dataset(dataset)
+                else:
+                    save_dataset(dataset, file_format='parquet', output_dir=os.path.join(workdir, 'partitioned'))
+                elapsed = time.perf_counter() - start
+        finally:
+            os.chdir(previous)
+        return len(dataset), elapsed
+
+    if stage == 'end_to_end':
+        batches = iter_literacy_batches(questions_per_topic, (level,), seed=seed, vectorized=True)
+        start = time.perf_counter()
+        rows = write_dataset_stream(batches, path)
+        return rows, time.perf_counter() - start
+
+    if stage == 'write':
+        # Write one prepared batch over and over so only the writer is timed
+        frame = render_batch(level, topics[0], *sample_option_indices(level, min(n, DEFAULT_BATCH_SIZE), rng))
+        batches = (frame.iloc[:count] for count in chunk_sizes(n))
+        start = time.perf_counter()
+        rows = write_dataset_stream(batches, path)
+        return rows, time.perf_counter() - start
+
+    elapsed = 0.0
+    offset = 0
+
+    for count in chunk_sizes(n):
+        started = time.perf_counter()
+        template_ids, option_indices = sample_option_indices(level, count, rng)
+        sampled = time.perf_counter()
+        if stage == 'wrong_answers':
+            # Per-row function, without the batch API's per-summary cache
+            summaries = render_texts(level, template_ids, option_indices)[1]
+            started = time.perf_counter()
+            for summary in summaries:
+                generate_wrong_answers(summary, level)
+            elapsed += time.perf_counter() - started
+            continue
+        if stage == 'sample':
+            elapsed += sampled - started
+            continue
+
+        rendered = render_texts(level, template_ids, option_indices)
+        rendered_at = time.perf_counter()
+        if stage == 'render':
+            elapsed += rendered_at - sampled
+            continue
+
+        wrong_answers = generate_wrong_answers_batch(rendered[1], level)
+        distracted = time.perf_counter()
+        if stage == 'distractors':
+            elapsed += distracted - rendered_at
+            continue
+
+        build_batch_frame(level, topics[0], offset, *rendered, wrong_answers)
+        elapsed += time.perf_counter() - distracted
+        offset += count
+
+    return n, elapsed
+
+def best_of(stage, level, n, path, seed=0, repeat=DEFAULT_REPEAT, min_seconds=MIN_CASE_SECONDS):
+    """Time a case like timeit.repeat: return (rows, fastest seconds) over several runs"""
+
+    timings = []
+    while len(timings) < repeat or sum(timings) < min_seconds:
+        rows, seconds = run_stage(stage, level, n, path, seed)
+        timings.append(seconds)
+    return rows, min(timings)
+
+def run_benchmarks(scales=SCALES, levels=LEVELS, stages=STAGES, seed=0, track_memory=True, repeat=DEFAULT_REPEAT):
+    """Run every (stage, level, scale) case, return a list of result dicts
+
+    Throughput comes from the fastest of several untraced runs; peak memory
+    from one more run under tracemalloc, since tracing slows Python code down.
+    """
+
+    results = []
+
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, 'benchmark.csv')
+
+        for n in scales:
+            for level in levels:
+                for stage in stages:
+                    rows, seconds = best_of(stage, level, n, path, seed, repeat)
+
+                    peak_mb = None
+                    if track_memory:
+                        tracemalloc.start()
+                        try:
+                            run_stage(stage, level, n, path, seed)
+                            peak_mb = tracemalloc.get_traced_memory()[1] / 2 ** 20
+                        finally:
+                            tracemalloc.stop()
+
+                    result = {
+                        'stage': stage,
+                        'level': level,
+                        'scale': n,
+                        'rows': rows,
+                        'seconds': seconds,
+                        'rows_per_sec': rows / seconds if seconds else float('inf'),
+                        'peak_mb': peak_mb
+                    }
+                    results.append(result)
+                    print(format_result(result), flush=True)
+
+    return results
+
+def result_key(result):
+    """Baseline key of a benchmark case"""
+    return f"{result['stage']}/L{result['level']}/{result['scale']}"
+
+def format_result(result):
+    """One printable line for a benchmark case"""
+    memory = '' if result['peak_mb'] is None else f", peak {result['peak_mb']:.1f} MB"
+    return f"{result_key(result):<24} {result['rows_per_sec']:>12,.0f} rows/sec{memory}"
+
+def settle_baseline(results, seed=0, repeat=DEFAULT_REPEAT, windows=BASELINE_WINDOWS):
+    """Replace each case's time by the median of several best-of timings"""
+
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, 'benchmark.csv')
+
+        for result in results:
+            timings = [result['seconds']]
+            timings += [best_of(result['stage'], result['level'], result['scale'], path, seed, repeat)[1] for _ in range(windows - 1)]
+            result['seconds'] = float(np.median(timings))
+            result['rows_per_sec'] = result['rows'] / result['seconds'] if result['seconds'] else float('inf')
+
+    return results
+
+def save_baseline(results, path=BASELINE_PATH):
+    """Store results as the baseline later runs are compared with"""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({result_key(result): result for result in results}, f, indent=2, sort_keys=True)
+
+def load_baseline(path=BASELINE_PATH):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+def is_slower(result, baseline, tolerance=DEFAULT_TOLERANCE):
+    """Whether a case's throughput is below what the baseline allows"""
+    previous = baseline.get(result_key(result))
+    return previous is not None and result['rows_per_sec'] < previous['rows_per_sec'] * (1 - tolerance)
+
+def confirm_slowdowns(results, baseline, tolerance=DEFAULT_TOLERANCE, seed=0, repeat=DEFAULT_REPEAT, budget=CONFIRM_SECONDS):
+    """Time cases that look slower than the baseline again, keeping their best run
+
+    A timing window can land in a slow spell of a shared machine, so a case
+    only stays slower if no run within its budget reaches the baseline.
+    """
+
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, 'benchmark.csv')
+
+        for result in results:
+            deadline = time.perf_counter() + budget
+            while is_slower(result, baseline, tolerance) and time.perf_counter() < deadline:
+                _, seconds = best_of(result['stage'], result['level'], result['scale'], path, seed, repeat)
+                if seconds < result['seconds']:
+                    result['seconds'] = seconds
+                    result['rows_per_sec'] = result['rows'] / seconds if seconds else float('inf')
+
+    return results
+
+def compare_with_baseline(results, path=BASELINE_PATH, tolerance=DEFAULT_TOLERANCE):
+    """Return a message for every case that got slower or hungrier than the baseline allows"""
+
+    baseline = load_baseline(path)
+    regressions = []
+
+    for result in results:
+        previous = baseline.get(result_key(result))
+        if previous is None:
+            continue
+
+        if is_slower(result, baseline, tolerance):
+            regressions.append(
+                f"{result_key(result)}: {result['rows_per_sec']:,.0f} rows/sec, "
+                f"baseline {previous['rows_per_sec']:,.0f}"
+            )
+
+        if result['peak_mb'] is not None and previous.get('peak_mb') is not None:
+            allowed = max(previous['peak_mb'] * (1 + tolerance), previous['peak_mb'] + MEMORY_NOISE_MB)
+            if result['peak_mb'] > allowed:
+                regressions.append(
+                    f"{result_key(result)}: peak {result['peak_mb']:.1f} MB, "
+                    f"baseline {previous['peak_mb']:.1f} MB"
+                )
+
+    return regressions
+
+def check_seed_determinism(questions_per_topic=200, seed=0, worker_counts=(1, 2, 4)):
+    """Return a message for every way seeded output differs between calls or worker counts
+
+    Covers both the list API and the streamed CSV bytes, called with only a
+    seed (the defaults otherwise) and with each worker count.
+    """
+
+    problems = []
+    reference = create_indonesian_literacy_dataset(questions_per_topic, seed=seed)
+    if create_indonesian_literacy_dataset(questions_per_topic, seed=seed) != reference:
+        problems.append(f"create_indonesian_literacy_dataset(seed={seed}) differs between two calls")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        reference_path = os.path.join(workdir, 'reference.csv')
+        write_dataset_stream(iter_literacy_batches(questions_per_topic, seed=seed), reference_path)
+        with open(reference_path, 'rb') as f:
+            reference_bytes = f.read()
+
+        for workers in worker_counts:
+            if create_indonesian_literacy_dataset(questions_per_topic, seed=seed, workers=workers) != reference:
+                problems.append(f"create_indonesian_literacy_dataset(seed={seed}, workers={workers}) differs")
+
+            path = os.path.join(workdir, f'workers_{workers}.csv')
+            write_dataset_stream(iter_literacy_batches(questions_per_topic, seed=seed, workers=workers), path)
+            with open(path, 'rb') as f:
+                if f.read() != reference_bytes:
+                    problems.append(f"CSV written with seed={seed}, workers={workers} differs")
+
+    return problems
+
+def parse_int_list(value):
+    """Parse a comma-separated list of integers such as 1000,100000"""
+    return tuple(int(item) for item in value.split(',') if item)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the literacy dataset generation pipeline")
+    parser.add_argument('--scales', type=parse_int_list, default=SCALES, help="comma-separated row counts per level")
+    parser.add_argument('--levels', type=parse_levels, default=LEVELS, help="comma-separated levels to run")
+    parser.add_argument('--stages', default=','.join(STAGES), help=f"comma-separated subset of {', '.join(STAGES)}")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help="minimum timed runs per case; the fastest counts")
+    parser.add_argument('--no-memory', action='store_true', help="skip the tracemalloc peak memory run")
+    parser.add_argument('--baseline', default=BASELINE_PATH, help="baseline JSON file")
+    parser.add_argument('--save-baseline', action='store_true', help="store this run as the new baseline")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE, help="allowed relative regression")
+    parser.add_argument('--templates', action='store_true', help="also compare str.replace with compiled templates")
+    parser.add_argument('--check-determinism', action='store_true', help="only check that seeded output matches across worker counts")
+    args = parser.parse_args(argv)
+
+    if args.check_determinism:
+        problems = check_seed_determinism(seed=args.seed)
+        for problem in problems:
+            print(problem)
+        print("Seeded output is deterministic" if not problems else f"{len(problems)} determinism problem(s)")
+        return 1 if problems else 0
+
+    if args.repeat < 1:
+        parser.error("--repeat must be at least 1")
+
+    stages = tuple(stage for stage in args.stages.split(',') if stage)
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(sorted(unknown))}")
+
+    if args.templates:
+        print("Template rendering: str.replace vs compiled")
+        for result in bench_template_rendering():
+            print(
+                f"Level {result['level']} ({result['slots']} slots): "
+                f"replace {result['replace_us_per_row']:.2f} us/row, "
+                f"compiled {result['compiled_us_per_row']:.2f} us/row, "
+                f"{result['speedup']:.1f}x"
+            )
+        print()
+
+    print("Dataset pipeline benchmark")
+    results = run_benchmarks(args.scales, args.levels, stages, args.seed, not args.no_memory, args.repeat)
+
+    if args.save_baseline:
+        save_baseline(settle_baseline(results, args.seed, args.repeat), args.baseline)
+        print(f"\nBaseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"\nNo baseline at {args.baseline}; run with --save-baseline to create one")
+        return 0
+
+    confirm_slowdowns(results, load_baseline(args.baseline), args.tolerance, args.seed, args.repeat)
+    regressions = compare_with_baseline(results, args.baseline, args.tolerance)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) against {args.baseline}:")
+        for regression in regressions:
+            print(f"  {regression}")
+        return 1
+
+    print(f"\nNo regressions against {args.baseline}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
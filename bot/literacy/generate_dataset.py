@@ -1,34 +1,452 @@
-import pandas as pd
+import argparse
+import collections
+import concurrent.futures
+import contextlib
+import functools
+import hashlib
+import itertools
+import json
+import math
+import os
 import random
+import re
+import shutil
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from question_index import SamplingIndexBuilder, allocate_evenly, build_sampling_index, line_offsets, remove_index
+
+LEVELS = (1, 2, 3, 4, 5)
+
+COLUMNS = [
+    'id', 'level', 'topic', 'text', 'word_count', 'sentence_count',
+    'correct_summary', 'wrong_answer_1', 'wrong_answer_2', 'wrong_answer_3',
+    'difficulty_score', 'language'
+]
+
+# Rows buffered before a batch is handed to the writer
+DEFAULT_BATCH_SIZE = 10000
+
+# Share of a combination space above which unique sampling enumerates it
+FULL_ENUMERATION_FRACTION = 0.02
+
+# Define templates for each level
+TEMPLATES = {
+    1: {
+        "topics": ["keluarga", "sekolah", "makanan", "hewan", "permainan"],
+        "templates": [
+            {
+                "text": "{nama} adalah {sifat} yang {aktivitas1}. Setiap {waktu} {nama} {aktivitas2} di {tempat}. {nama} merasa {perasaan} ketika {aktivitas3}. {keluarga} sangat {reaksi} dengan {nama}.",
+                "summary": "{nama} adalah {sifat} yang {aktivitas1} dan {aktivitas2}",
+                "variables": {
+                    "nama": ["Ani", "Budi", "Citra", "Doni", "Eka", "Fira", "Gita", "Hadi", "Ina", "Joko"],
+                    "sifat": ["anak rajin", "anak pintar", "anak baik", "siswa teladan", "anak ceria"],
+                    "aktivitas1": ["suka belajar", "gemar membaca", "rajin berolahraga", "senang membantu", "hobi menggambar"],
+                    "aktivitas2": ["bermain", "belajar", "membaca", "berolahraga", "membantu"],
+                    "aktivitas3": ["belajar", "bermain", "membantu orang lain", "membaca buku", "menggambar"],
+                    "waktu": ["pagi hari", "sore hari", "sepulang sekolah", "hari minggu", "waktu luang"],
+                    "tempat": ["rumah", "sekolah", "taman", "perpustakaan", "lapangan"],
+                    "perasaan": ["senang", "bahagia", "bangga", "gembira", "puas"],
+                    "keluarga": ["Keluarga", "Orang tua", "Ayah dan ibu", "Kakak dan adik"],
+                    "reaksi": ["bangga", "senang", "bahagia", "puas", "mendukung"]
+                }
+            },
+            {
+                "text": "Di {tempat} ada {objek} yang {sifat}. Setiap hari {pelaku} datang untuk {aktivitas}. {objek} sangat {manfaat} untuk {pelaku}. Semua orang {reaksi} dengan {objek} tersebut.",
+                "summary": "{tempat} memiliki {objek} yang {manfaat} untuk {pelaku}",
+                "variables": {
+                    "tempat": ["sekolah", "rumah", "taman", "desa", "kota"],
+                    "objek": ["perpustakaan", "taman", "lapangan", "kolam", "kebun"],
+                    "sifat": ["indah", "bersih", "luas", "nyaman", "asri"],
+                    "pelaku": ["anak-anak", "siswa", "warga", "keluarga", "masyarakat"],
+                    "aktivitas": ["bermain", "belajar", "membaca", "berolahraga", "bersantai"],
+                    "manfaat": ["bermanfaat", "berguna", "membantu", "menyenangkan", "penting"],
+                    "reaksi": ["senang", "puas", "bangga", "bahagia", "antusias"]
+                }
+            }
+        ]
+    },
+    2: {
+        "topics": ["pendidikan", "lingkungan", "kesehatan", "ekonomi", "teknologi"],
+        "templates": [
+            {
+                "text": "{institusi} mengadakan {program} untuk {target}. Program ini bertujuan {tujuan} dan {manfaat}. Para {pelaku} {partisipasi} dengan {cara}. Hasil dari program ini {hasil} bagi {penerima}. {otoritas} {dukungan} terhadap program tersebut.",
+                "summary": "{institusi} mengadakan {program} yang {hasil} bagi {target}",
+                "variables": {
+                    "institusi": ["Sekolah", "Puskesmas", "Kelurahan", "Koperasi", "Dinas Pendidikan"],
+                    "program": ["program kebersihan", "program kesehatan", "pelatihan komputer", "bank sampah", "lomba literasi"],
+                    "target": ["siswa", "warga", "petani", "ibu-ibu", "anak-anak"],
+                    "tujuan": ["meningkatkan kesadaran", "memberikan pendidikan", "mengembangkan keterampilan", "memperbaiki kondisi"],
+                    "manfaat": ["meningkatkan kualitas hidup", "memberikan penghasilan tambahan", "menjaga lingkungan", "mengembangkan potensi"],
+                    "pelaku": ["peserta", "warga", "siswa", "masyarakat", "relawan"],
+                    "partisipasi": ["berpartisipasi aktif", "antusias mengikuti", "bergotong royong", "bekerja sama"],
+                    "cara": ["penuh semangat", "secara teratur", "dengan giat", "bersama-sama"],
+                    "hasil": ["memberikan dampak positif", "sangat bermanfaat", "berhasil meningkatkan", "efektif membantu"],
+                    "penerima": ["masyarakat", "lingkungan", "peserta", "warga sekitar"],
+                    "otoritas": ["Kepala desa", "Pemerintah daerah", "Dinas terkait", "Tokoh masyarakat"],
+                    "dukungan": ["memberikan dukungan penuh", "sangat mendukung", "mengapresiasi", "bangga dengan"]
+                }
+            }
+        ]
+    },
+    3: {
+        "topics": ["sosial", "budaya", "pembangunan", "pertanian", "kewirausahaan"],
+        "templates": [
+            {
+                "text": "{masalah} menjadi perhatian utama di {lokasi} dalam beberapa tahun terakhir. {penyebab1} dan {penyebab2} menjadi faktor utama yang memperburuk kondisi tersebut. {pihak1} bekerja sama dengan {pihak2} untuk {solusi}. Melalui pendekatan {metode}, mereka berhasil {pencapaian}. {dampak} terhadap {penerima_manfaat} sangat signifikan. Program ini diharapkan dapat {harapan} di masa mendatang.",
+                "summary": "{pihak1} dan {pihak2} berhasil mengatasi {masalah} melalui {solusi}",
+                "variables": {
+                    "masalah": ["masalah sampah", "kurangnya akses pendidikan", "kemiskinan petani", "pengangguran pemuda", "kerusakan lingkungan"],
+                    "lokasi": ["desa terpencil", "kawasan perkotaan", "daerah pesisir", "wilayah pegunungan", "area perdesaan"],
+                    "penyebab1": ["kurangnya kesadaran masyarakat", "terbatasnya infrastruktur", "minimnya modal usaha", "rendahnya pendidikan"],
+                    "penyebab2": ["tidak adanya program pemerintah", "sulitnya akses transportasi", "kurangnya teknologi", "lemahnya koordinasi"],
+                    "pihak1": ["Pemerintah daerah", "Organisasi masyarakat", "Lembaga swadaya", "Kelompok tani"],
+                    "pihak2": ["masyarakat setempat", "sektor swasta", "universitas", "LSM lingkungan"],
+                    "solusi": ["mengembangkan program pemberdayaan", "membangun infrastruktur", "memberikan pelatihan", "menciptakan lapangan kerja"],
+                    "metode": ["partisipatif", "berkelanjutan", "terintegrasi", "inovatif"],
+                    "pencapaian": ["meningkatkan kesejahteraan", "mengurangi masalah", "mengembangkan potensi lokal", "memperbaiki kondisi"],
+                    "dampak": ["Perubahan positif", "Peningkatan kualitas hidup", "Kemajuan ekonomi", "Perbaikan lingkungan"],
+                    "penerima_manfaat": ["masyarakat lokal", "generasi muda", "keluarga petani", "lingkungan sekitar"],
+                    "harapan": ["diperluas ke daerah lain", "berkelanjutan jangka panjang", "menjadi model percontohan", "terus berkembang"]
+                }
+            }
+        ]
+    },
+    4: {
+        "topics": ["politik", "ekonomi_makro", "teknologi_informasi", "globalisasi", "demografi"],
+        "templates": [
+            {
+                "text": "{fenomena} telah mengubah {aspek} di Indonesia secara fundamental dalam dekade terakhir. {faktor1}, {faktor2}, dan {faktor3} menjadi pendorong utama transformasi ini. {dampak_positif} terlihat jelas dalam {sektor1} dan {sektor2}, namun {tantangan} juga muncul bersamaan. {stakeholder1} dan {stakeholder2} harus {strategi} untuk {tujuan}. {kebijakan} yang tepat diperlukan untuk {hasil_diharapkan}. Tanpa {syarat}, {risiko} dapat mengancam {target_perlindungan}.",
+                "summary": "{fenomena} mengubah {aspek} Indonesia dengan {dampak_positif} namun memerlukan {strategi}",
+                "variables": {
+                    "fenomena": ["Revolusi digital", "Urbanisasi masif", "Perubahan iklim", "Globalisasi ekonomi", "Transisi demografi"],
+                    "aspek": ["struktur ekonomi", "pola konsumsi masyarakat", "sistem pendidikan", "tata kelola pemerintahan", "interaksi sosial"],
+                    "faktor1": ["kemajuan teknologi", "pertumbuhan populasi", "perubahan kebijakan", "integrasi global"],
+                    "faktor2": ["peningkatan konektivitas", "mobilitas sosial", "inovasi berkelanjutan", "diversifikasi ekonomi"],
+                    "faktor3": ["kesadaran lingkungan", "dinamika politik", "kompetisi internasional", "evolusi budaya"],
+                    "dampak_positif": ["peningkatan efisiensi", "demokratisasi akses", "akselerasi pertumbuhan", "diversifikasi peluang"],
+                    "sektor1": ["sektor pendidikan", "industri kreatif", "layanan kesehatan", "perdagangan digital"],
+                    "sektor2": ["transportasi publik", "sistem perbankan", "media komunikasi", "energi terbarukan"],
+                    "tantangan": ["kesenjangan digital", "disparitas regional", "degradasi lingkungan", "ketimpangan sosial"],
+                    "stakeholder1": ["Pemerintah pusat", "Sektor swasta", "Institusi pendidikan", "Organisasi masyarakat"],
+                    "stakeholder2": ["pemerintah daerah", "komunitas lokal", "lembaga internasional", "generasi muda"],
+                    "strategi": ["mengembangkan sinergi", "memperkuat regulasi", "meningkatkan kapasitas", "membangun kolaborasi"],
+                    "tujuan": ["mencapai pembangunan berkelanjutan", "menjamin keadilan sosial", "mempertahankan daya saing", "melestarikan identitas budaya"],
+                    "kebijakan": ["Regulasi yang adaptif", "Investasi strategis", "Program pemberdayaan", "Reformasi struktural"],
+                    "hasil_diharapkan": ["mengoptimalkan manfaat", "meminimalkan risiko", "mempercepat adaptasi", "menjamin inklusivitas"],
+                    "syarat": ["koordinasi yang efektif", "komitmen jangka panjang", "partisipasi aktif masyarakat", "alokasi sumber daya yang memadai"],
+                    "risiko": ["disintegrasi sosial", "ketimpangan yang makin lebar", "degradasi kualitas hidup", "kehilangan identitas nasional"],
+                    "target_perlindungan": ["kohesi sosial", "keseimbangan ekosistem", "kedaulatan bangsa", "kesejahteraan generasi mendatang"]
+                }
+            }
+        ]
+    },
+    5: {
+        "topics": ["filsafat_sosial", "epistemologi", "kompleksitas_sistem", "paradigma_pembangunan", "transformasi_peradaban"],
+        "templates": [
+            {
+                "text": "{konsep_abstrak} dalam konteks {domain} Indonesia menuntut {pendekatan} yang {karakteristik_pendekatan}. {premis1} mendasari {asumsi} bahwa {proposisi}. Namun, {kontradiksi} menghasilkan {paradoks} yang {sifat_paradoks}. {metodologi} melalui {instrumen} dapat {kemampuan_metodologi} untuk {sasaran_analisis}. {sintesis} antara {elemen1} dan {elemen2} menghasilkan {output_sintesis} yang {kualitas_output}. {implikasi} terhadap {ranah_dampak} memerlukan {respons_strategis} yang {karakteristik_respons}.",
+                "summary": "{konsep_abstrak} memerlukan {pendekatan} untuk mengatasi {paradoks} dan menghasilkan {output_sintesis}",
+                "variables": {
+                    "konsep_abstrak": ["Konstruksi identitas kolektif", "Dialektika modernitas-tradisi", "Epistemologi pengetahuan lokal", "Paradigma pembangunan berkelanjutan", "Transformasi kesadaran sosial"],
+                    "domain": ["masyarakat multikultural", "ekonomi politik", "sistem pendidikan", "tata kelola publik", "ekosistem inovasi"],
+                    "pendekatan": ["pendekatan hermeneutik", "analisis sistem kompleks", "metodologi partisipatif", "kerangka interdisipliner", "perspektif holistik"],
+                    "karakteristik_pendekatan": ["kontekstual dan adaptif", "integratif dan komprehensif", "reflektif dan kritis", "dinamis dan responsif", "inklusif dan emansipatoris"],
+                    "premis1": ["Asumsi epistemologis", "Paradigma positivistik", "Kerangka konstruktivis", "Perspektif fenomenologis"],
+                    "asumsi": ["pemahaman linear", "kausalitas deterministik", "objektivitas mutlak", "universalitas nilai"],
+                    "proposisi": ["realitas sosial dapat diprediksi", "perubahan mengikuti pola tertentu", "kemajuan bersifat unidireksional", "modernisasi adalah keniscayaan"],
+                    "kontradiksi": ["kompleksitas empiris", "dinamika sosial-budaya", "heterogenitas kontekstual", "ambiguitas struktural"],
+                    "paradoks": ["dikotomi yang saling bergantung", "kontinuitas dalam diskontinuitas", "stabilitas melalui perubahan", "unity dalam diversity"],
+                    "sifat_paradoks": ["fundamentally irreducible", "inherently productive", "contextually situated", "dynamically evolving"],
+                    "metodologi": ["Pendekatan transdisipliner", "Analisis multi-level", "Metode campuran", "Penelitian aksi partisipatif"],
+                    "instrumen": ["triangulasi data", "refleksi kritis", "dialog intersubjektif", "sintesis dialektik"],
+                    "kemampuan_metodologi": ["mengungkap kompleksitas laten", "memfasilitasi pemahaman mendalam", "mengintegrasikan perspektif beragam", "menghasilkan insight transformatif"],
+                    "sasaran_analisis": ["struktur makna tersembunyi", "pola interaksi kompleks", "mekanisme perubahan sosial", "potensi transformatif"],
+                    "sintesis": ["Integrasi dialektik", "Rekonsiliasi paradoks", "Konvergensi perspektif", "Hibridisasi konseptual"],
+                    "elemen1": ["rasionalitas instrumental", "pengetahuan ilmiah", "efisiensi sistemik", "modernitas"],
+                    "elemen2": ["kearifan tradisional", "intuisi kolektif", "nilai-nilai komunal", "lokalitas"],
+                    "output_sintesis": ["hybrid epistemology", "wisdom-based innovation", "contextual universalism", "adaptive modernization"],
+                    "kualitas_output": ["epistemologically robust", "culturally resonant", "practically viable", "ethically sustainable"],
+                    "implikasi": ["Konsekuensi epistemologis", "Ramifikasi praktis", "Derivasi teoritis", "Implikasi normatif"],
+                    "ranah_dampak": ["konstruksi kebijakan publik", "design sistem pendidikan", "reformasi institusional", "transformasi budaya"],
+                    "respons_strategis": ["reorientasi paradigmatik", "rekonfigurasi struktural", "revitalisasi nilai", "reformasi sistemik"],
+                    "karakteristik_respons": ["fundamentally transformative", "contextually grounded", "systemically coherent", "ethically committed"]
+                }
+            }
+        ]
+    }
+}
+
+def count_sentence_marks(text):
+    """Number of sentence-ending punctuation marks in text"""
+    return text.count('.') + text.count('!') + text.count('?')
+
+PLACEHOLDER_PATTERN = re.compile(r"\{(\w+)\}")
+
+class CompiledTemplate:
+    """Template string split once into literal and slot segments"""
+    
+    __slots__ = ('literals', 'slots')
+    
+    def __init__(self, source, names):
+        # Slots refer to variables by position in names; unknown
+        # placeholders are kept as literal text, like str.replace would
+        positions = {name: i for i, name in enumerate(names)}
+        parts = PLACEHOLDER_PATTERN.split(source)
+        literals = [parts[0]]
+        slots = []
+        for i in range(1, len(parts), 2):
+            name, literal = parts[i], parts[i + 1]
+            if name in positions:
+                slots.append(positions[name])
+                literals.append(literal)
+            else:
+                literals[-1] += "{" + name + "}" + literal
+        
+        self.literals = tuple(literals)
+        self.slots = tuple(slots)
+    
+    def render(self, values):
+        """Fill the slots from values (ordered like names) with a single join"""
+        parts = [None] * (2 * len(self.slots) + 1)
+        parts[::2] = self.literals
+        parts[1::2] = [values[i] for i in self.slots]
+        return "".join(parts)
+
+class CompiledLevelTemplate:
+    """Text and summary templates compiled against one shared variable order"""
+    
+    __slots__ = (
+        'names', 'options', 'text', 'summary', 'radices', 'place_values', 'capacity',
+        'word_counts', 'punctuation_counts', 'base_word_count', 'base_punctuation_count'
+    )
+    
+    def __init__(self, template):
+        self.names = tuple(template["variables"])
+        self.options = tuple(tuple(options) for options in template["variables"].values())
+        self.text = CompiledTemplate(template["text"], self.names)
+        self.summary = CompiledTemplate(template["summary"], self.names)
+        self.radices = np.array([len(options) for options in self.options], dtype=np.int64)
+        
+        # Mixed-radix place values: the last variable is the least significant digit
+        self.capacity = math.prod(len(options) for options in self.options)
+        place_values = [math.prod(len(options) for options in self.options[j + 1:]) for j in range(len(self.options))]
+        self.place_values = np.array(place_values, dtype=np.int64) if self.capacity < 2 ** 63 else None
+        
+        # A value without surrounding whitespace touches its neighbours exactly like
+        # a one-word placeholder does, so text statistics are a per-template base
+        # plus one lookup per slot. Templates that break this fall back to splitting.
+        if all(value and value == value.strip() for options in self.options for value in options):
+            occurrences = np.bincount(self.text.slots, minlength=len(self.names))
+            self.word_counts = [
+                count * np.array([len(value.split()) for value in options], dtype=np.int64)
+                for count, options in zip(occurrences, self.options)
+            ]
+            self.punctuation_counts = [
+                count * np.array([count_sentence_marks(value) for value in options], dtype=np.int64)
+                for count, options in zip(occurrences, self.options)
+            ]
+            self.base_word_count = len(self.text.render(["x"] * len(self.names)).split()) - len(self.text.slots)
+            self.base_punctuation_count = sum(count_sentence_marks(literal) for literal in self.text.literals)
+        else:
+            self.word_counts = None
+            self.punctuation_counts = None
+            self.base_word_count = None
+            self.base_punctuation_count = None
+    
+    def text_statistics(self, option_indices, texts):
+        """Word and sentence counts for rendered texts drawn from option_indices"""
+        if self.word_counts is None:
+            word_count = np.array([len(text.split()) for text in texts], dtype=np.int64)
+            sentence_count = np.array([count_sentence_marks(text) for text in texts], dtype=np.int64)
+            return word_count, sentence_count
+        
+        word_count = np.full(len(option_indices), self.base_word_count, dtype=np.int64)
+        sentence_count = np.full(len(option_indices), self.base_punctuation_count, dtype=np.int64)
+        for j, (words, marks) in enumerate(zip(self.word_counts, self.punctuation_counts)):
+            column = option_indices[:, j]
+            word_count += words[column]
+            sentence_count += marks[column]
+        return word_count, sentence_count
+
+@functools.lru_cache(maxsize=None)
+def compile_level(level):
+    """Compile every template of a level once"""
+    return tuple(CompiledLevelTemplate(template) for template in TEMPLATES[level]["templates"])
+
+def level_capacity(level):
+    """Number of distinct items a level's templates can produce"""
+    return sum(template.capacity for template in compile_level(level))
+
+def level_code_offsets(level):
+    """First combination code of every template in the level-wide code space"""
+    capacities = [template.capacity for template in compile_level(level)]
+    return np.array([0] + list(itertools.accumulate(capacities))[:-1], dtype=np.int64)
+
+def template_capacity_report(levels=LEVELS):
+    """DataFrame of every template's variable count and combination capacity"""
+    
+    report = []
+    for level in levels:
+        total = level_capacity(level)
+        for template_id, template in enumerate(compile_level(level)):
+            report.append({
+                'level': level,
+                'template': template_id,
+                'variables': len(template.names),
+                'capacity': template.capacity,
+                'level_capacity': total,
+                'share': template.capacity / total
+            })
+    
+    return pd.DataFrame(report, columns=['level', 'template', 'variables', 'capacity', 'level_capacity', 'share'])
+
+def encode_option_indices(level, template_ids, option_indices):
+    """Encode rows as integers in the level's mixed-radix combination space"""
+    
+    offsets = level_code_offsets(level)
+    codes = np.zeros(len(template_ids), dtype=np.int64)
+    
+    for template_id, template in enumerate(compile_level(level)):
+        rows = np.flatnonzero(template_ids == template_id)
+        if len(rows):
+            indices = option_indices[rows, :len(template.names)].astype(np.int64)
+            codes[rows] = offsets[template_id] + indices @ template.place_values
+    
+    return codes
+
+def decode_option_indices(level, codes):
+    """Inverse of encode_option_indices: return (template_ids, option_indices)"""
+    
+    level_templates = compile_level(level)
+    width = max(len(template.names) for template in level_templates)
+    offsets = level_code_offsets(level)
+    codes = np.asarray(codes, dtype=np.int64)
+    
+    template_ids = (np.searchsorted(offsets, codes, side='right') - 1).astype(np.uint8)
+    option_indices = np.zeros((len(codes), width), dtype=np.uint8)
+    
+    for template_id, template in enumerate(level_templates):
+        rows = np.flatnonzero(template_ids == template_id)
+        if len(rows):
+            local = codes[rows] - offsets[template_id]
+            option_indices[rows, :len(template.names)] = (local[:, None] // template.place_values) % template.radices
+    
+    return template_ids, option_indices
+
+def sample_distinct(capacity, n, rng):
+    """Draw n distinct integers below capacity
+    
+    Close to the space size the space is enumerated and permuted; below
+    that numpy samples sparsely, without materializing the space or
+    rejecting duplicates.
+    """
+    if n >= capacity * FULL_ENUMERATION_FRACTION:
+        return rng.permutation(capacity)[:n]
+    return rng.choice(capacity, size=n, replace=False)
+
+def sample_unique_codes(level, n, rng):
+    """Draw n distinct combination codes of a level without replacement
+    
+    Like sample_option_indices, rows are spread evenly over the level's
+    templates; a template with fewer combinations than its share gives all
+    it has and the rest goes to the others. Each template's codes are drawn
+    within its own block of the code space, then shuffled together.
+    """
+    
+    capacity = level_capacity(level)
+    if n > capacity:
+        raise ValueError(f"Level {level} has only {capacity} distinct items, {n} requested")
+    if capacity >= 2 ** 63:
+        raise ValueError(f"Level {level} combination space does not fit in 64-bit codes")
+    
+    capacities = [template.capacity for template in compile_level(level)]
+    offsets = level_code_offsets(level)
+    codes = np.concatenate([
+        offsets[template_id] + sample_distinct(template_capacity, count, rng).astype(np.int64)
+        for template_id, (template_capacity, count) in enumerate(zip(capacities, allocate_evenly(n, capacities)))
+    ])
+    return rng.permutation(codes)
+
+# Distractor rules in priority order: (word, replacement)
+NEGATION_RULES = (
+    ("suka", "tidak suka"),
+    ("berhasil", "gagal"),
+    ("baik", "buruk"),
+)
+
+WORD_SWAP_RULES = (
+    ("sekolah", "rumah"),
+    ("membaca", "menulis"),
+    ("pagi", "malam"),
+)
+
+class RuleTable:
+    """Priority-ordered word rules compiled into one alternation regex"""
+    
+    __slots__ = ('rules', 'priority', 'pattern')
+    
+    def __init__(self, rules, whole_words=False):
+        self.rules = tuple(rules)
+        self.priority = {word: i for i, (word, _) in enumerate(self.rules)}
+        
+        # Longest words first so a rule is never shadowed by its own prefix
+        alternation = "|".join(re.escape(word) for word in sorted(self.priority, key=len, reverse=True))
+        if whole_words:
+            alternation = rf"(?<!\S)(?:{alternation})(?!\S)"
+        
+        # A plain scan skips text it has matched; only pay for a lookahead at
+        # every position when one rule word can overlap another
+        overlapping = any(
+            first != second and (second in first or any(first.endswith(second[:k]) for k in range(1, len(second))))
+            for first in self.priority for second in self.priority
+        )
+        self.pattern = re.compile(rf"(?=({alternation}))" if overlapping else f"({alternation})")
+    
+    def match(self, text):
+        """Return (word, replacement, position) of the highest-priority rule found, or None"""
+        best = None
+        for found in self.pattern.finditer(text):
+            rank = self.priority[found.group(1)]
+            if best is None or rank < best[0]:
+                best = (rank, found.start())
+                if rank == 0:
+                    break
+        
+        if best is None:
+            return None
+        word, replacement = self.rules[best[0]]
+        return word, replacement, best[1]
+
+NEGATION_TABLE = RuleTable(NEGATION_RULES)
+WORD_SWAP_TABLE = RuleTable(WORD_SWAP_RULES, whole_words=True)
 
 def generate_wrong_answers(correct_summary, level):
     """Generate 3 wrong answers based on common patterns"""
     wrong_answers = []
+    words = correct_summary.split()
     
-    # Pattern 1: Negation
-    if "suka" in correct_summary:
-        wrong_answers.append(correct_summary.replace("suka", "tidak suka"))
-    elif "berhasil" in correct_summary:
-        wrong_answers.append(correct_summary.replace("berhasil", "gagal"))
-    elif "baik" in correct_summary:
-        wrong_answers.append(correct_summary.replace("baik", "buruk"))
+    # Pattern 1: Negation, every occurrence of the matched word
+    negation = NEGATION_TABLE.match(correct_summary)
+    if negation is not None:
+        word, replacement, _ = negation
+        wrong_answers.append(correct_summary.replace(word, replacement))
     else:
-        wrong_answers.append(f"Tidak ada {correct_summary.split()[-1]} dalam cerita")
+        wrong_answers.append(f"Tidak ada {words[-1]} dalam cerita")
     
-    # Pattern 2: Wrong details
-    words = correct_summary.split()
+    # Pattern 2: Wrong details, first occurrence of one key word
     if len(words) > 3:
-        # Change one key word
-        modified = words.copy()
-        if "sekolah" in modified:
-            modified[modified.index("sekolah")] = "rumah"
-        elif "membaca" in modified:
-            modified[modified.index("membaca")] = "menulis"
-        elif "pagi" in modified:
-            modified[modified.index("pagi")] = "malam"
+        joined = " ".join(words)
+        swap = WORD_SWAP_TABLE.match(joined)
+        if swap is not None:
+            word, replacement, position = swap
+            wrong_answers.append(joined[:position] + replacement + joined[position + len(word):])
         else:
-            modified[-1] = "berbeda"
-        wrong_answers.append(" ".join(modified))
+            wrong_answers.append(" ".join(words[:-1] + ["berbeda"]))
     else:
         wrong_answers.append(f"Cerita tentang hal yang berbeda")
     
@@ -38,203 +456,58 @@ def generate_wrong_answers(correct_summary, level):
     else:
         wrong_answers.append("Informasi dalam teks tidak lengkap")
     
-    # Ensure we have exactly 3 unique wrong answers
-    wrong_answers = list(set(wrong_answers))[:3]
+    # Ensure we have exactly 3 unique wrong answers, keeping pattern order
+    # so seeded runs do not depend on hash randomization
+    wrong_answers = list(dict.fromkeys(wrong_answers))[:3]
     while len(wrong_answers) < 3:
         wrong_answers.append(f"Jawaban salah {len(wrong_answers) + 1}")
     
-    return wrong_answers[:3]
-
-def create_indonesian_literacy_dataset():
-    """Generate complete dataset for levels 1-5"""
-    
-    # Define templates for each level
-    templates = {
-        1: {
-            "topics": ["keluarga", "sekolah", "makanan", "hewan", "permainan"],
-            "templates": [
-                {
-                    "text": "{nama} adalah {sifat} yang {aktivitas1}. Setiap {waktu} {nama} {aktivitas2} di {tempat}. {nama} merasa {perasaan} ketika {aktivitas3}. {keluarga} sangat {reaksi} dengan {nama}.",
-                    "summary": "{nama} adalah {sifat} yang {aktivitas1} dan {aktivitas2}",
-                    "variables": {
-                        "nama": ["Ani", "Budi", "Citra", "Doni", "Eka", "Fira", "Gita", "Hadi", "Ina", "Joko"],
-                        "sifat": ["anak rajin", "anak pintar", "anak baik", "siswa teladan", "anak ceria"],
-                        "aktivitas1": ["suka belajar", "gemar membaca", "rajin berolahraga", "senang membantu", "hobi menggambar"],
-                        "aktivitas2": ["bermain", "belajar", "membaca", "berolahraga", "membantu"],
-                        "aktivitas3": ["belajar", "bermain", "membantu orang lain", "membaca buku", "menggambar"],
-                        "waktu": ["pagi hari", "sore hari", "sepulang sekolah", "hari minggu", "waktu luang"],
-                        "tempat": ["rumah", "sekolah", "taman", "perpustakaan", "lapangan"],
-                        "perasaan": ["senang", "bahagia", "bangga", "gembira", "puas"],
-                        "keluarga": ["Keluarga", "Orang tua", "Ayah dan ibu", "Kakak dan adik"],
-                        "reaksi": ["bangga", "senang", "bahagia", "puas", "mendukung"]
-                    }
-                },
-                {
-                    "text": "Di {tempat} ada {objek} yang {sifat}. Setiap hari {pelaku} datang untuk {aktivitas}. {objek} sangat {manfaat} untuk {pelaku}. Semua orang {reaksi} dengan {objek} tersebut.",
-                    "summary": "{tempat} memiliki {objek} yang {manfaat} untuk {pelaku}",
-                    "variables": {
-                        "tempat": ["sekolah", "rumah", "taman", "desa", "kota"],
-                        "objek": ["perpustakaan", "taman", "lapangan", "kolam", "kebun"],
-                        "sifat": ["indah", "bersih", "luas", "nyaman", "asri"],
-                        "pelaku": ["anak-anak", "siswa", "warga", "keluarga", "masyarakat"],
-                        "aktivitas": ["bermain", "belajar", "membaca", "berolahraga", "bersantai"],
-                        "manfaat": ["bermanfaat", "berguna", "membantu", "menyenangkan", "penting"],
-                        "reaksi": ["senang", "puas", "bangga", "bahagia", "antusias"]
-                    }
-                }
-            ]
-        },
-        2: {
-            "topics": ["pendidikan", "lingkungan", "kesehatan", "ekonomi", "teknologi"],
-            "templates": [
-                {
-                    "text": "{institusi} mengadakan {program} untuk {target}. Program ini bertujuan {tujuan} dan {manfaat}. Para {pelaku} {partisipasi} dengan {cara}. Hasil dari program ini {hasil} bagi {penerima}. {otoritas} {dukungan} terhadap program tersebut.",
-                    "summary": "{institusi} mengadakan {program} yang {hasil} bagi {target}",
-                    "variables": {
-                        "institusi": ["Sekolah", "Puskesmas", "Kelurahan", "Koperasi", "Dinas Pendidikan"],
-                        "program": ["program kebersihan", "program kesehatan", "pelatihan komputer", "bank sampah", "lomba literasi"],
-                        "target": ["siswa", "warga", "petani", "ibu-ibu", "anak-anak"],
-                        "tujuan": ["meningkatkan kesadaran", "memberikan pendidikan", "mengembangkan keterampilan", "memperbaiki kondisi"],
-                        "manfaat": ["meningkatkan kualitas hidup", "memberikan penghasilan tambahan", "menjaga lingkungan", "mengembangkan potensi"],
-                        "pelaku": ["peserta", "warga", "siswa", "masyarakat", "relawan"],
-                        "partisipasi": ["berpartisipasi aktif", "antusias mengikuti", "bergotong royong", "bekerja sama"],
-                        "cara": ["penuh semangat", "secara teratur", "dengan giat", "bersama-sama"],
-                        "hasil": ["memberikan dampak positif", "sangat bermanfaat", "berhasil meningkatkan", "efektif membantu"],
-                        "penerima": ["masyarakat", "lingkungan", "peserta", "warga sekitar"],
-                        "otoritas": ["Kepala desa", "Pemerintah daerah", "Dinas terkait", "Tokoh masyarakat"],
-                        "dukungan": ["memberikan dukungan penuh", "sangat mendukung", "mengapresiasi", "bangga dengan"]
-                    }
-                }
-            ]
-        },
-        3: {
-            "topics": ["sosial", "budaya", "pembangunan", "pertanian", "kewirausahaan"],
-            "templates": [
-                {
-                    "text": "{masalah} menjadi perhatian utama di {lokasi} dalam beberapa tahun terakhir. {penyebab1} dan {penyebab2} menjadi faktor utama yang memperburuk kondisi tersebut. {pihak1} bekerja sama dengan {pihak2} untuk {solusi}. Melalui pendekatan {metode}, mereka berhasil {pencapaian}. {dampak} terhadap {penerima_manfaat} sangat signifikan. Program ini diharapkan dapat {harapan} di masa mendatang.",
-                    "summary": "{pihak1} dan {pihak2} berhasil mengatasi {masalah} melalui {solusi}",
-                    "variables": {
-                        "masalah": ["masalah sampah", "kurangnya akses pendidikan", "kemiskinan petani", "pengangguran pemuda", "kerusakan lingkungan"],
-                        "lokasi": ["desa terpencil", "kawasan perkotaan", "daerah pesisir", "wilayah pegunungan", "area perdesaan"],
-                        "penyebab1": ["kurangnya kesadaran masyarakat", "terbatasnya infrastruktur", "minimnya modal usaha", "rendahnya pendidikan"],
-                        "penyebab2": ["tidak adanya program pemerintah", "sulitnya akses transportasi", "kurangnya teknologi", "lemahnya koordinasi"],
-                        "pihak1": ["Pemerintah daerah", "Organisasi masyarakat", "Lembaga swadaya", "Kelompok tani"],
-                        "pihak2": ["masyarakat setempat", "sektor swasta", "universitas", "LSM lingkungan"],
-                        "solusi": ["mengembangkan program pemberdayaan", "membangun infrastruktur", "memberikan pelatihan", "menciptakan lapangan kerja"],
-                        "metode": ["partisipatif", "berkelanjutan", "terintegrasi", "inovatif"],
-                        "pencapaian": ["meningkatkan kesejahteraan", "mengurangi masalah", "mengembangkan potensi lokal", "memperbaiki kondisi"],
-                        "dampak": ["Perubahan positif", "Peningkatan kualitas hidup", "Kemajuan ekonomi", "Perbaikan lingkungan"],
-                        "penerima_manfaat": ["masyarakat lokal", "generasi muda", "keluarga petani", "lingkungan sekitar"],
-                        "harapan": ["diperluas ke daerah lain", "berkelanjutan jangka panjang", "menjadi model percontohan", "terus berkembang"]
-                    }
-                }
-            ]
-        },
-        4: {
-            "topics": ["politik", "ekonomi_makro", "teknologi_informasi", "globalisasi", "demografi"],
-            "templates": [
-                {
-                    "text": "{fenomena} telah mengubah {aspek} di Indonesia secara fundamental dalam dekade terakhir. {faktor1}, {faktor2}, dan {faktor3} menjadi pendorong utama transformasi ini. {dampak_positif} terlihat jelas dalam {sektor1} dan {sektor2}, namun {tantangan} juga muncul bersamaan. {stakeholder1} dan {stakeholder2} harus {strategi} untuk {tujuan}. {kebijakan} yang tepat diperlukan untuk {hasil_diharapkan}. Tanpa {syarat}, {risiko} dapat mengancam {target_perlindungan}.",
-                    "summary": "{fenomena} mengubah {aspek} Indonesia dengan {dampak_positif} namun memerlukan {strategi}",
-                    "variables": {
-                        "fenomena": ["Revolusi digital", "Urbanisasi masif", "Perubahan iklim", "Globalisasi ekonomi", "Transisi demografi"],
-                        "aspek": ["struktur ekonomi", "pola konsumsi masyarakat", "sistem pendidikan", "tata kelola pemerintahan", "interaksi sosial"],
-                        "faktor1": ["kemajuan teknologi", "pertumbuhan populasi", "perubahan kebijakan", "integrasi global"],
-                        "faktor2": ["peningkatan konektivitas", "mobilitas sosial", "inovasi berkelanjutan", "diversifikasi ekonomi"],
-                        "faktor3": ["kesadaran lingkungan", "dinamika politik", "kompetisi internasional", "evolusi budaya"],
-                        "dampak_positif": ["peningkatan efisiensi", "demokratisasi akses", "akselerasi pertumbuhan", "diversifikasi peluang"],
-                        "sektor1": ["sektor pendidikan", "industri kreatif", "layanan kesehatan", "perdagangan digital"],
-                        "sektor2": ["transportasi publik", "sistem perbankan", "media komunikasi", "energi terbarukan"],
-                        "tantangan": ["kesenjangan digital", "disparitas regional", "degradasi lingkungan", "ketimpangan sosial"],
-                        "stakeholder1": ["Pemerintah pusat", "Sektor swasta", "Institusi pendidikan", "Organisasi masyarakat"],
-                        "stakeholder2": ["pemerintah daerah", "komunitas lokal", "lembaga internasional", "generasi muda"],
-                        "strategi": ["mengembangkan sinergi", "memperkuat regulasi", "meningkatkan kapasitas", "membangun kolaborasi"],
-                        "tujuan": ["mencapai pembangunan berkelanjutan", "menjamin keadilan sosial", "mempertahankan daya saing", "melestarikan identitas budaya"],
-                        "kebijakan": ["Regulasi yang adaptif", "Investasi strategis", "Program pemberdayaan", "Reformasi struktural"],
-                        "hasil_diharapkan": ["mengoptimalkan manfaat", "meminimalkan risiko", "mempercepat adaptasi", "menjamin inklusivitas"],
-                        "syarat": ["koordinasi yang efektif", "komitmen jangka panjang", "partisipasi aktif masyarakat", "alokasi sumber daya yang memadai"],
-                        "risiko": ["disintegrasi sosial", "ketimpangan yang makin lebar", "degradasi kualitas hidup", "kehilangan identitas nasional"],
-                        "target_perlindungan": ["kohesi sosial", "keseimbangan ekosistem", "kedaulatan bangsa", "kesejahteraan generasi mendatang"]
-                    }
-                }
-            ]
-        },
-        5: {
-            "topics": ["filsafat_sosial", "epistemologi", "kompleksitas_sistem", "paradigma_pembangunan", "transformasi_peradaban"],
-            "templates": [
-                {
-                    "text": "{konsep_abstrak} dalam konteks {domain} Indonesia menuntut {pendekatan} yang {karakteristik_pendekatan}. {premis1} mendasari {asumsi} bahwa {proposisi}. Namun, {kontradiksi} menghasilkan {paradoks} yang {sifat_paradoks}. {metodologi} melalui {instrumen} dapat {kemampuan_metodologi} untuk {sasaran_analisis}. {sintesis} antara {elemen1} dan {elemen2} menghasilkan {output_sintesis} yang {kualitas_output}. {implikasi} terhadap {ranah_dampak} memerlukan {respons_strategis} yang {karakteristik_respons}.",
-                    "summary": "{konsep_abstrak} memerlukan {pendekatan} untuk mengatasi {paradoks} dan menghasilkan {output_sintesis}",
-                    "variables": {
-                        "konsep_abstrak": ["Konstruksi identitas kolektif", "Dialektika modernitas-tradisi", "Epistemologi pengetahuan lokal", "Paradigma pembangunan berkelanjutan", "Transformasi kesadaran sosial"],
-                        "domain": ["masyarakat multikultural", "ekonomi politik", "sistem pendidikan", "tata kelola publik", "ekosistem inovasi"],
-                        "pendekatan": ["pendekatan hermeneutik", "analisis sistem kompleks", "metodologi partisipatif", "kerangka interdisipliner", "perspektif holistik"],
-                        "karakteristik_pendekatan": ["kontekstual dan adaptif", "integratif dan komprehensif", "reflektif dan kritis", "dinamis dan responsif", "inklusif dan emansipatoris"],
-                        "premis1": ["Asumsi epistemologis", "Paradigma positivistik", "Kerangka konstruktivis", "Perspektif fenomenologis"],
-                        "asumsi": ["pemahaman linear", "kausalitas deterministik", "objektivitas mutlak", "universalitas nilai"],
-                        "proposisi": ["realitas sosial dapat diprediksi", "perubahan mengikuti pola tertentu", "kemajuan bersifat unidireksional", "modernisasi adalah keniscayaan"],
-                        "kontradiksi": ["kompleksitas empiris", "dinamika sosial-budaya", "heterogenitas kontekstual", "ambiguitas struktural"],
-                        "paradoks": ["dikotomi yang saling bergantung", "kontinuitas dalam diskontinuitas", "stabilitas melalui perubahan", "unity dalam diversity"],
-                        "sifat_paradoks": ["fundamentally irreducible", "inherently productive", "contextually situated", "dynamically evolving"],
-                        "metodologi": ["Pendekatan transdisipliner", "Analisis multi-level", "Metode campuran", "Penelitian aksi partisipatif"],
-                        "instrumen": ["triangulasi data", "refleksi kritis", "dialog intersubjektif", "sintesis dialektik"],
-                        "kemampuan_metodologi": ["mengungkap kompleksitas laten", "memfasilitasi pemahaman mendalam", "mengintegrasikan perspektif beragam", "menghasilkan insight transformatif"],
-                        "sasaran_analisis": ["struktur makna tersembunyi", "pola interaksi kompleks", "mekanisme perubahan sosial", "potensi transformatif"],
-                        "sintesis": ["Integrasi dialektik", "Rekonsiliasi paradoks", "Konvergensi perspektif", "Hibridisasi konseptual"],
-                        "elemen1": ["rasionalitas instrumental", "pengetahuan ilmiah", "efisiensi sistemik", "modernitas"],
-                        "elemen2": ["kearifan tradisional", "intuisi kolektif", "nilai-nilai komunal", "lokalitas"],
-                        "output_sintesis": ["hybrid epistemology", "wisdom-based innovation", "contextual universalism", "adaptive modernization"],
-                        "kualitas_output": ["epistemologically robust", "culturally resonant", "practically viable", "ethically sustainable"],
-                        "implikasi": ["Konsekuensi epistemologis", "Ramifikasi praktis", "Derivasi teoritis", "Implikasi normatif"],
-                        "ranah_dampak": ["konstruksi kebijakan publik", "design sistem pendidikan", "reformasi institusional", "transformasi budaya"],
-                        "respons_strategis": ["reorientasi paradigmatik", "rekonfigurasi struktural", "revitalisasi nilai", "reformasi sistemik"],
-                        "karakteristik_respons": ["fundamentally transformative", "contextually grounded", "systemically coherent", "ethically committed"]
-                    }
-                }
-            ]
-        }
-    }
+    return wrong_answers
+
+def generate_wrong_answers_batch(summaries, level):
+    """Generate wrong answers for a column of summaries, as three ordered columns
+    
+    Summaries repeat a lot at scale, so each distinct one is processed once.
+    """
+    
+    cache = {}
+    columns = ([], [], [])
     
-    dataset = []
+    for summary in summaries:
+        answers = cache.get(summary)
+        if answers is None:
+            answers = cache[summary] = generate_wrong_answers(summary, level)
+        for column, answer in zip(columns, answers):
+            column.append(answer)
+    
+    return columns
+
+def iter_literacy_rows(questions_per_topic=10, levels=LEVELS):
+    """Yield dataset rows one at a time, level by level"""
     
     # Generate data for each level
-    for level in range(1, 6):
-        level_config = templates[level]
-        topics = level_config["topics"]
-        level_templates = level_config["templates"]
-        
-        # Generate 50 questions per level (10 per topic)
-        questions_per_topic = 50 // len(topics)
+    for level in levels:
+        topics = TEMPLATES[level]["topics"]
+        level_templates = compile_level(level)
         
         for topic in topics:
             for i in range(questions_per_topic):
                 # Select random template
                 template = random.choice(level_templates)
                 
-                # Generate text and summary
-                text = template["text"]
-                summary_template = template["summary"]
-                variables = template["variables"]
-                
-                # Replace variables with random choices
-                chosen_vars = {}
-                for var, options in variables.items():
-                    chosen_vars[var] = random.choice(options)
-                
-                # Replace in text
-                for var, value in chosen_vars.items():
-                    text = text.replace(f"{{{var}}}", value)
-                    summary_template = summary_template.replace(f"{{{var}}}", value)
+                # Choose one option per variable; text and summary share the bindings
+                values = [random.choice(options) for options in template.options]
+                text = template.text.render(values)
+                summary_template = template.summary.render(values)
                 
                 # Calculate text statistics
                 word_count = len(text.split())
-                sentence_count = text.count('.') + text.count('!') + text.count('?')
+                sentence_count = count_sentence_marks(text)
                 
                 # Generate wrong answers
                 wrong_answers = generate_wrong_answers(summary_template, level)
                 
-                # Add to dataset
-                dataset.append({
+                yield {
                     'id': f'L{level}_{topic}_{i+1:03d}',
                     'level': level,
                     'topic': topic,
@@ -247,19 +520,727 @@ def create_indonesian_literacy_dataset():
                     'wrong_answer_3': wrong_answers[2],
                     'difficulty_score': level * 2 + (word_count / 50),
                     'language': 'indonesian'
-                })
+                }
+
+def sample_option_indices(level, n, rng):
+    """Draw template ids and option indices for n rows of a level
+    
+    Returns (template_ids, option_indices) where option_indices is an
+    (n, widest template) uint8 matrix; columns past a template's own
+    variables are zero. Each template's block is drawn in one call.
+    """
+    
+    level_templates = compile_level(level)
+    width = max(len(template.names) for template in level_templates)
+    
+    template_ids = rng.integers(0, len(level_templates), size=n).astype(np.uint8)
+    option_indices = np.zeros((n, width), dtype=np.uint8)
+    
+    for template_id, template in enumerate(level_templates):
+        rows = np.flatnonzero(template_ids == template_id)
+        if len(rows):
+            draws = rng.integers(0, template.radices, size=(len(rows), len(template.names)))
+            option_indices[rows, :len(template.names)] = draws
+    
+    return template_ids, option_indices
+
+def render_texts(level, template_ids, option_indices):
+    """Render texts and summaries of sampled rows, return (texts, summaries, word_count, sentence_count)"""
+    
+    n = len(template_ids)
+    level_templates = compile_level(level)
+    
+    texts = [None] * n
+    summaries = [None] * n
+    word_count = np.zeros(n, dtype=np.int64)
+    sentence_count = np.zeros(n, dtype=np.int64)
+    
+    for template_id, template in enumerate(level_templates):
+        rows = np.flatnonzero(template_ids == template_id)
+        if not len(rows):
+            continue
+        
+        indices = option_indices[rows, :len(template.names)]
+        options = template.options
+        render_text = template.text.render
+        render_summary = template.summary.render
+        
+        template_texts = []
+        for row, chosen in zip(rows.tolist(), indices.tolist()):
+            values = [option[i] for option, i in zip(options, chosen)]
+            text = render_text(values)
+            texts[row] = text
+            summaries[row] = render_summary(values)
+            template_texts.append(text)
+        
+        word_count[rows], sentence_count[rows] = template.text_statistics(indices, template_texts)
+    
+    return texts, summaries, word_count, sentence_count
+
+def build_batch_frame(level, topic, start, texts, summaries, word_count, sentence_count, wrong_answers):
+    """Assemble rendered columns into a dataset DataFrame"""
+    
+    n = len(texts)
+    wrong_answer_1, wrong_answer_2, wrong_answer_3 = wrong_answers
+    
+    return pd.DataFrame({
+        'id': [f'L{level}_{topic}_{i + 1:03d}' for i in range(start, start + n)],
+        'level': np.full(n, level, dtype=np.int64),
+        'topic': [topic] * n,
+        'text': texts,
+        'word_count': word_count,
+        'sentence_count': sentence_count,
+        'correct_summary': summaries,
+        'wrong_answer_1': wrong_answer_1,
+        'wrong_answer_2': wrong_answer_2,
+        'wrong_answer_3': wrong_answer_3,
+        'difficulty_score': level * 2 + word_count / 50,
+        'language': ['indonesian'] * n
+    }, columns=COLUMNS)
+
+def render_batch(level, topic, template_ids, option_indices, start=0):
+    """Render sampled rows into a DataFrame, with statistics computed per batch"""
+    texts, summaries, word_count, sentence_count = render_texts(level, template_ids, option_indices)
+    wrong_answers = generate_wrong_answers_batch(summaries, level)
+    return build_batch_frame(level, topic, start, texts, summaries, word_count, sentence_count, wrong_answers)
+
+PROFILE_STAGES = ('sampling', 'rendering', 'distractors', 'dataframe', 'encode', 'write', 'index', 'cache')
+
+class StageProfiler:
+    """Wall time and allocated memory accumulated per pipeline stage
+    
+    Memory is measured with tracemalloc and is only reported while tracing
+    is on; the peak is the most memory a single call of the stage added.
+    """
+    
+    __slots__ = ('stages',)
+    
+    def __init__(self):
+        self.stages = {}
+    
+    def record(self, name, seconds, peak_bytes=0, calls=1):
+        stats = self.stages.setdefault(name, {'seconds': 0.0, 'peak_bytes': 0, 'calls': 0})
+        stats['seconds'] += seconds
+        stats['peak_bytes'] = max(stats['peak_bytes'], peak_bytes)
+        stats['calls'] += calls
+    
+    def merge(self, stages):
+        """Add stage statistics collected by another profiler, e.g. in a worker process"""
+        for name, stats in stages.items():
+            self.record(name, stats['seconds'], stats['peak_bytes'], stats['calls'])
+    
+    @contextlib.contextmanager
+    def stage(self, name):
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            peak_bytes = tracemalloc.get_traced_memory()[1] - before if tracing else 0
+            self.record(name, seconds, peak_bytes)
+    
+    def report(self, wall_seconds=None):
+        """Printable table of the collected stages"""
+        names = [name for name in PROFILE_STAGES if name in self.stages]
+        names += [name for name in self.stages if name not in PROFILE_STAGES]
+        total = sum(stats['seconds'] for stats in self.stages.values()) or 1.0
+        
+        lines = [f"{'stage':<12} {'calls':>7} {'seconds':>10} {'share':>7} {'peak MB':>9}"]
+        for name in names:
+            stats = self.stages[name]
+            lines.append(
+                f"{name:<12} {stats['calls']:>7} {stats['seconds']:>10.3f} "
+                f"{stats['seconds'] / total:>7.1%} {stats['peak_bytes'] / 2 ** 20:>9.1f}"
+            )
+        if wall_seconds is not None:
+            lines.append(f"{'wall time':<12} {'':>7} {wall_seconds:>10.3f}")
+        return "\n".join(lines)
+
+def profile_stage(profiler, name):
+    """Time a stage on profiler, or do nothing when there is no profiler"""
+    return contextlib.nullcontext() if profiler is None else profiler.stage(name)
+
+Shard = collections.namedtuple('Shard', ['level', 'topic', 'start', 'count', 'seed', 'codes'])
+
+def plan_shards(questions_per_topic=10, levels=LEVELS, seed=None, shard_size=DEFAULT_BATCH_SIZE, unique=False):
+    """Split generation into Shard(level, topic, start, count, seed, codes) in output order
+    
+    Every shard gets its own SeedSequence derived from the master seed and
+    its (level, topic, shard) position, so a shard's rows do not depend on
+    which process generates it or in which order. With unique=True the
+    distinct combination codes of a whole level are drawn up front and
+    handed out to its shards, so no item repeats anywhere in the level.
+    """
+    
+    master = np.random.SeedSequence(seed).entropy
+    shards = []
+    
+    for level in levels:
+        topics = TEMPLATES[level]["topics"]
+        
+        level_codes = None
+        if unique:
+            level_rng = np.random.default_rng(np.random.SeedSequence(master, spawn_key=(level,)))
+            level_codes = sample_unique_codes(level, questions_per_topic * len(topics), level_rng)
+        
+        for topic_index, topic in enumerate(topics):
+            for shard_index, start in enumerate(range(0, questions_per_topic, shard_size)):
+                count = min(shard_size, questions_per_topic - start)
+                shard_seed = np.random.SeedSequence(master, spawn_key=(level, topic_index, shard_index))
+                codes = None
+                if level_codes is not None:
+                    offset = topic_index * questions_per_topic + start
+                    codes = level_codes[offset:offset + count]
+                shards.append(Shard(level, topic, start, count, shard_seed, codes))
+    
+    return shards
+
+def sample_shard(shard):
+    """Template ids and option indices of one shard, sampled or decoded from its codes"""
+    if shard.codes is not None:
+        return decode_option_indices(shard.level, shard.codes)
+    rng = np.random.default_rng(shard.seed)
+    return sample_option_indices(shard.level, shard.count, rng)
+
+def generate_shard(shard, profiler=None):
+    """Sample and render one shard into a DataFrame"""
+    
+    with profile_stage(profiler, 'sampling'):
+        template_ids, option_indices = sample_shard(shard)
+    with profile_stage(profiler, 'rendering'):
+        rendered = render_texts(shard.level, template_ids, option_indices)
+    with profile_stage(profiler, 'distractors'):
+        wrong_answers = generate_wrong_answers_batch(rendered[1], shard.level)
+    with profile_stage(profiler, 'dataframe'):
+        return build_batch_frame(shard.level, shard.topic, shard.start, *rendered, wrong_answers)
+
+def generate_shard_profiled(shard):
+    """generate_shard for a worker process: return the DataFrame and its stage statistics"""
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+    profiler = StageProfiler()
+    return generate_shard(shard, profiler), profiler.stages
+
+def encode_shard(shard, file_format='csv', index=False, profiled=False):
+    """Generate one shard and encode it for writing, in the process that runs it
+    
+    Returns the EncodedBatch and, when profiled, its stage statistics.
+    """
+    
+    profiler = None
+    if profiled:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        profiler = StageProfiler()
+    
+    batch = generate_shard(shard, profiler)
+    with profile_stage(profiler, 'encode'):
+        encoded = encode_batch(batch, file_format, index)
+    return encoded, None if profiler is None else profiler.stages
+
+def map_shards(function, shards, workers=1):
+    """Apply function to every shard, yielding results in shard order
+    
+    With more than one worker the shards run in a process pool; only a
+    couple of shards per worker are in flight so memory stays bounded when
+    the consumer is slower than the pool.
+    """
+    
+    if workers is None or workers < 1:
+        workers = os.cpu_count() or 1
+    
+    if workers == 1:
+        for shard in shards:
+            yield function(shard)
+        return
+    
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = collections.deque()
+        for shard in shards:
+            pending.append(pool.submit(function, shard))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+def iter_literacy_batches(questions_per_topic=10, levels=LEVELS, batch_size=DEFAULT_BATCH_SIZE, seed=None, vectorized=False, workers=1, unique=False, profiler=None):
+    """Yield the dataset as DataFrames of at most batch_size rows
+    
+    With vectorized=True the variables of every batch are drawn from a
+    numpy Generator instead of per-row random.choice calls. Batches are
+    shards seeded from seed, so the same seed and batch_size give the same
+    rows for any number of workers. A seed, unique=True (sampling every
+    level without replacement) and workers > 1 all imply vectorized=True;
+    only unseeded single-process runs use the random module.
+    A StageProfiler passed as profiler collects per-stage statistics, also
+    from worker processes.
+    """
+    
+    if vectorized or workers != 1 or unique or seed is not None:
+        shards = plan_shards(questions_per_topic, levels, seed, batch_size, unique)
+        if profiler is None:
+            yield from map_shards(generate_shard, shards, workers)
+        elif workers == 1:
+            yield from map_shards(functools.partial(generate_shard, profiler=profiler), shards)
+        else:
+            for batch, stages in map_shards(generate_shard_profiled, shards, workers):
+                profiler.merge(stages)
+                yield batch
+        return
+    
+    batch = []
+    for row in iter_literacy_rows(questions_per_topic, levels):
+        batch.append(row)
+        if len(batch) == batch_size:
+            yield pd.DataFrame(batch, columns=COLUMNS)
+            batch = []
+    
+    if batch:
+        yield pd.DataFrame(batch, columns=COLUMNS)
+
+def iter_encoded_batches(questions_per_topic=10, levels=LEVELS, batch_size=DEFAULT_BATCH_SIZE, seed=None, workers=1, unique=False, file_format='csv', index=False, profiler=None):
+    """Yield the shards of iter_literacy_batches(vectorized=True) encoded for write_encoded_stream
+    
+    Workers return CSV bytes or Arrow tables instead of DataFrames, so
+    building, encoding and pickling rows all happen in parallel and the
+    parent process is left with writing them out in order.
+    """
+    
+    shards = plan_shards(questions_per_topic, levels, seed, batch_size, unique)
+    
+    if workers == 1:
+        for shard in shards:
+            batch = generate_shard(shard, profiler)
+            with profile_stage(profiler, 'encode'):
+                encoded = encode_batch(batch, file_format, index)
+            yield encoded
+        return
+    
+    function = functools.partial(encode_shard, file_format=file_format, index=index, profiled=profiler is not None)
+    for encoded, stages in map_shards(function, shards, workers):
+        if stages is not None:
+            profiler.merge(stages)
+        yield encoded
+
+def create_indonesian_literacy_dataset(questions_per_topic=10, levels=LEVELS, seed=None, vectorized=False, workers=1, unique=False):
+    """Generate complete dataset for levels 1-5; a seed makes it reproducible for any worker count"""
+    
+    # 10 questions per topic, 50 per level by default
+    if vectorized or workers != 1 or unique or seed is not None:
+        batches = iter_literacy_batches(questions_per_topic, levels, seed=seed, vectorized=True, workers=workers, unique=unique)
+        return [row for batch in batches for row in batch.to_dict('records')]
+    
+    return list(iter_literacy_rows(questions_per_topic, levels))
+
+def template_fingerprint(levels=LEVELS):
+    """Hash of the template configuration of the given levels"""
+    config = json.dumps({str(level): TEMPLATES[level] for level in sorted(levels)}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(config.encode('utf-8')).hexdigest()
+
+class CompactDataset:
+    """Array-backed question bank that stores recipes and renders rows on access
+    
+    A row is fully determined by its level, topic, position within the
+    topic, template id and one option index per template variable, so it
+    takes a few dozen bytes instead of the rendered text, summary and
+    wrong answers.
+    """
+    
+    __slots__ = ('levels', 'topic_indices', 'positions', 'template_ids', 'option_indices')
+    
+    def __init__(self, levels, topic_indices, positions, template_ids, option_indices):
+        self.levels = np.asarray(levels, dtype=np.uint8)
+        self.topic_indices = np.asarray(topic_indices, dtype=np.uint8)
+        self.positions = np.asarray(positions, dtype=np.uint32)
+        self.template_ids = np.asarray(template_ids, dtype=np.uint8)
+        self.option_indices = np.asarray(option_indices, dtype=np.uint8)
+    
+    def __len__(self):
+        return len(self.levels)
+    
+    def __getitem__(self, index):
+        """Render a single row as a dict"""
+        if index < 0:
+            index += len(self)
+        return self.materialize(index, index + 1).to_dict('records')[0]
+    
+    @property
+    def nbytes(self):
+        """Memory taken by the recipe arrays"""
+        return sum(getattr(self, name).nbytes for name in self.__slots__)
+    
+    def recipe(self, index):
+        """Hashable recipe of a row: equal recipes render to the same text"""
+        level = int(self.levels[index])
+        template_id = int(self.template_ids[index])
+        width = len(compile_level(level)[template_id].names)
+        return level, template_id, self.option_indices[index, :width].tobytes()
+    
+    def take(self, indices):
+        """New CompactDataset holding only the given rows"""
+        return CompactDataset(*(getattr(self, name)[indices] for name in self.__slots__))
+    
+    def materialize(self, start=0, stop=None):
+        """Render rows start:stop into a DataFrame"""
+        
+        stop = len(self) if stop is None else min(stop, len(self))
+        levels = self.levels[start:stop]
+        topic_indices = self.topic_indices[start:stop]
+        positions = self.positions[start:stop].astype(np.int64)
+        
+        # Render runs of consecutive rows from the same level and topic together
+        breaks = (levels[1:] != levels[:-1]) | (topic_indices[1:] != topic_indices[:-1]) | (positions[1:] != positions[:-1] + 1)
+        bounds = [0, *(np.flatnonzero(breaks) + 1).tolist(), len(levels)]
+        
+        frames = []
+        for run_start, run_stop in zip(bounds[:-1], bounds[1:]):
+            if run_start == run_stop:
+                continue
+            level = int(levels[run_start])
+            topic = TEMPLATES[level]["topics"][topic_indices[run_start]]
+            frames.append(render_batch(
+                level,
+                topic,
+                self.template_ids[start + run_start:start + run_stop],
+                self.option_indices[start + run_start:start + run_stop],
+                int(positions[run_start])
+            ))
+        
+        if not frames:
+            return pd.DataFrame(columns=COLUMNS)
+        return pd.concat(frames, ignore_index=True)
+    
+    def iter_batches(self, batch_size=DEFAULT_BATCH_SIZE):
+        """Yield rendered DataFrames of at most batch_size rows, for the stream writers"""
+        for start in range(0, len(self), batch_size):
+            yield self.materialize(start, start + batch_size)
+    
+    def save(self, path):
+        """Write the recipe arrays and the template fingerprint to a compressed .npz file"""
+        levels = np.unique(self.levels).tolist()
+        np.savez_compressed(
+            path,
+            fingerprint=np.array(template_fingerprint(levels)),
+            **{name: getattr(self, name) for name in self.__slots__}
+        )
+    
+    @classmethod
+    def load(cls, path):
+        """Read a dataset written by save; the templates must not have changed since"""
+        with np.load(path) as data:
+            dataset = cls(*(data[name] for name in cls.__slots__))
+            fingerprint = str(data['fingerprint'])
+        
+        if fingerprint != template_fingerprint(np.unique(dataset.levels).tolist()):
+            raise ValueError(f"{path} was generated from different templates and cannot be rendered")
+        return dataset
+
+def generate_compact_dataset(questions_per_topic=10, levels=LEVELS, seed=None, unique=False, shard_size=DEFAULT_BATCH_SIZE):
+    """Sample the dataset as a CompactDataset without rendering any text
+    
+    Uses the same shards and seeds as iter_literacy_batches, so rendering
+    the result gives the rows of the vectorized path for the same arguments.
+    """
+    
+    shards = plan_shards(questions_per_topic, levels, seed, shard_size, unique)
+    width = max(len(template.names) for level in levels for template in compile_level(level))
+    
+    n = sum(shard.count for shard in shards)
+    dataset = CompactDataset(
+        np.zeros(n, dtype=np.uint8),
+        np.zeros(n, dtype=np.uint8),
+        np.zeros(n, dtype=np.uint32),
+        np.zeros(n, dtype=np.uint8),
+        np.zeros((n, width), dtype=np.uint8)
+    )
+    
+    row = 0
+    for shard in shards:
+        template_ids, option_indices = sample_shard(shard)
+        rows = slice(row, row + shard.count)
+        dataset.levels[rows] = shard.level
+        dataset.topic_indices[rows] = TEMPLATES[shard.level]["topics"].index(shard.topic)
+        dataset.positions[rows] = np.arange(shard.start, shard.start + shard.count)
+        dataset.template_ids[rows] = template_ids
+        dataset.option_indices[rows, :option_indices.shape[1]] = option_indices
+        row += shard.count
     
     return dataset
 
-def save_dataset(dataset, separate_files=False):
-    """Save dataset to CSV files"""
+EncodedBatch = collections.namedtuple('EncodedBatch', ['rows', 'columns', 'data', 'index_rows'])
+
+# Columns the sampling index is built from
+INDEX_COLUMNS = ['level', 'topic', 'difficulty_score']
+
+def encode_batch(batch, file_format='csv', index=False):
+    """Encode a DataFrame for write_encoded_stream
+    
+    CSV batches become their rows as bytes, without a header; Parquet
+    batches become an Arrow table. With index=True the columns the sampling
+    index needs are kept alongside.
+    """
+    
+    if file_format == 'csv':
+        data = batch.to_csv(index=False, header=False, lineterminator='\n').encode('utf-8')
+    else:
+        import pyarrow as pa
+        data = pa.Table.from_pandas(batch, preserve_index=False)
+    
+    index_rows = batch[INDEX_COLUMNS] if index else None
+    return EncodedBatch(len(batch), tuple(batch.columns), data, index_rows)
+
+def encode_batches(batches, file_format='csv', index=False, profiler=None):
+    """Encode DataFrames one at a time as they are consumed"""
+    for batch in batches:
+        with profile_stage(profiler, 'encode'):
+            encoded = encode_batch(batch, file_format, index)
+        yield encoded
+
+def write_dataset_stream(batches, path, file_format=None, profiler=None, index=False):
+    """Append each batch to a CSV or Parquet file as it arrives, return the row count
+    
+    With index=True (CSV only) the byte offset of every row is recorded while
+    writing and a sampling index is saved next to the file, see question_index.
+    Otherwise an index left next to the file by an earlier run is removed.
+    """
+    
+    if file_format is None:
+        file_format = 'parquet' if str(path).endswith('.parquet') else 'csv'
+    
+    return write_encoded_stream(encode_batches(batches, file_format, index, profiler), path, file_format, profiler, index)
+
+def write_encoded_stream(encoded_batches, path, file_format='csv', profiler=None, index=False):
+    """Write batches already encoded by encode_batch in order, return the row count
+    
+    Takes the place of write_dataset_stream when batches were encoded where
+    they were generated, e.g. by iter_encoded_batches in worker processes.
+    """
+    
+    if file_format not in ('csv', 'parquet'):
+        raise ValueError(f"Unsupported file format: {file_format}")
+    
+    if index and file_format != 'csv':
+        raise ValueError("Sampling indexes are only built for CSV output")
+    
+    total = 0
+    
+    if file_format == 'csv':
+        builder = SamplingIndexBuilder() if index else None
+        columns = None
+        
+        # An index left from an earlier file would point at the wrong rows
+        remove_index(path)
+        with open(path, 'wb') as f:
+            for encoded in encoded_batches:
+                with profile_stage(profiler, 'write'):
+                    if columns is None:
+                        columns = list(encoded.columns)
+                        f.write(pd.DataFrame(columns=columns).to_csv(index=False, lineterminator='\n').encode('utf-8'))
+                    if builder is not None and encoded.rows:
+                        builder.add_batch(encoded.index_rows, line_offsets(encoded.data, f.tell()))
+                    f.write(encoded.data)
+                    f.flush()
+                total += encoded.rows
+            
+            # Keep the header even when no rows were generated
+            if columns is None:
+                columns = COLUMNS
+                f.write(pd.DataFrame(columns=COLUMNS).to_csv(index=False, lineterminator='\n').encode('utf-8'))
+        
+        if builder is not None:
+            with profile_stage(profiler, 'index'):
+                builder.write(path, columns)
+        return total
+    
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    
+    writer = None
+    try:
+        for encoded in encoded_batches:
+            with profile_stage(profiler, 'write'):
+                table = encoded.data
+                if writer is None:
+                    writer = pq.ParquetWriter(path, table.schema)
+                else:
+                    table = table.cast(writer.schema)
+                writer.write_table(table)
+            total += encoded.rows
+        
+        if writer is None:
+            empty = pa.Table.from_pandas(pd.DataFrame(columns=COLUMNS), preserve_index=False)
+            writer = pq.ParquetWriter(path, empty.schema)
+    finally:
+        if writer is not None:
+            writer.close()
+    
+    return total
+
+def shard_filename(shard, file_format='csv'):
+    """File name of a shard written by write_dataset_shards"""
+    return f'indonesian_literacy_L{shard.level}_{shard.topic}_{shard.start:09d}.{file_format}'
+
+def write_shard(task):
+    """Generate one shard and write it to its own file, return the path"""
+    shard, path, file_format = task
+    write_dataset_stream([generate_shard(shard)], path, file_format)
+    return path
+
+def write_dataset_shards(output_dir, questions_per_topic=10, levels=LEVELS, seed=None, workers=1, shard_size=DEFAULT_BATCH_SIZE, file_format='csv', unique=False):
+    """Write every shard to its own file in output_dir, return the paths in shard order
+    
+    Workers write their shards directly instead of sending rows back to the
+    parent, which keeps the pool from being bound by pickling DataFrames.
+    """
+    
+    os.makedirs(output_dir, exist_ok=True)
+    shards = plan_shards(questions_per_topic, levels, seed, shard_size, unique)
+    tasks = [
+        (shard, os.path.join(output_dir, shard_filename(shard, file_format)), file_format)
+        for shard in shards
+    ]
+    return list(map_shards(write_shard, tasks, workers))
+
+def arrow_schema():
+    """Arrow schema of a dataset batch, with the repetitive language column dictionary-encoded"""
+    import pyarrow as pa
+    
+    return pa.schema([
+        ('id', pa.string()),
+        ('level', pa.int64()),
+        ('topic', pa.string()),
+        ('text', pa.string()),
+        ('word_count', pa.int64()),
+        ('sentence_count', pa.int64()),
+        ('correct_summary', pa.string()),
+        ('wrong_answer_1', pa.string()),
+        ('wrong_answer_2', pa.string()),
+        ('wrong_answer_3', pa.string()),
+        ('difficulty_score', pa.float64()),
+        ('language', pa.dictionary(pa.int32(), pa.string()))
+    ])
+
+def partition_format(file_format):
+    """pyarrow dataset format and file extension for a columnar export format"""
+    import pyarrow.dataset as ds
+    
+    if file_format == 'parquet':
+        return ds.ParquetFileFormat(), 'parquet'
+    if file_format in ('arrow', 'feather', 'ipc'):
+        return ds.IpcFileFormat(), 'arrow'
+    raise ValueError(f"Unsupported columnar format: {file_format}")
+
+def write_partitioned_dataset(batches, output_dir, file_format='parquet', compression='zstd', profiler=None):
+    """Write batches in one pass to output_dir/level=<n>/topic=<name>/ partitions
+    
+    level and topic live in the hive-style directory names, language is
+    dictionary-encoded and every column is compressed. Existing files of a
+    partition that is written again are replaced. Returns the row count.
+    """
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    
+    schema = arrow_schema()
+    file_format, extension = partition_format(file_format)
+    total = 0
+    producing = 0.0
+    
+    def record_batches():
+        nonlocal total, producing
+        iterator = iter(batches)
+        while True:
+            # Time spent producing batches belongs to the upstream stages
+            started = time.perf_counter()
+            batch = next(iterator, None)
+            producing += time.perf_counter() - started
+            if batch is None:
+                return
+            total += len(batch)
+            yield from pa.Table.from_pandas(batch, schema=schema, preserve_index=False).to_batches()
+    
+    started = time.perf_counter()
+    
+    partitioning = ds.partitioning(pa.schema([('level', pa.int64()), ('topic', pa.string())]), flavor='hive')
+    ds.write_dataset(
+        record_batches(),
+        output_dir,
+        schema=schema,
+        format=file_format,
+        partitioning=partitioning,
+        file_options=file_format.make_write_options(compression=compression),
+        basename_template=f'part-{{i}}.{extension}',
+        existing_data_behavior='delete_matching',
+        preserve_order=True
+    )
+    
+    if profiler is not None:
+        profiler.record('write', time.perf_counter() - started - producing)
+    
+    return total
+
+def open_partitioned_dataset(output_dir, file_format='parquet'):
+    """Open a partitioned export as a memory-mapped pyarrow dataset
+    
+    level and topic come back dictionary-encoded from the directory names.
+    """
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.fs as pafs
+    
+    partitioning = ds.partitioning(
+        pa.schema([
+            ('level', pa.dictionary(pa.int32(), pa.int64())),
+            ('topic', pa.dictionary(pa.int32(), pa.string()))
+        ]),
+        flavor='hive',
+        dictionaries='infer'
+    )
+    return ds.dataset(
+        output_dir,
+        format=partition_format(file_format)[0],
+        partitioning=partitioning,
+        filesystem=pafs.LocalFileSystem(use_mmap=True)
+    )
+
+def load_partitioned_dataset(output_dir, level=None, topic=None, columns=None, file_format='parquet'):
+    """Load one level/topic partition (or all) and a projection of columns as a DataFrame
+    
+    Only the files of the matching partitions are opened and only the
+    requested columns are decoded.
+    """
+    import pyarrow.dataset as ds
+    
+    dataset = open_partitioned_dataset(output_dir, file_format)
+    
+    condition = None
+    if level is not None:
+        condition = ds.field('level') == level
+    if topic is not None:
+        topic_condition = ds.field('topic') == topic
+        condition = topic_condition if condition is None else condition & topic_condition
+    
+    if columns is None:
+        columns = COLUMNS
+    return dataset.to_table(columns=list(columns), filter=condition).to_pandas()
+
+def save_dataset(dataset, separate_files=False, file_format='csv', output_dir='indonesian_literacy_dataset'):
+    """Save dataset to CSV files, or to a partitioned Parquet/Arrow directory"""
+    
+    if file_format != 'csv':
+        df = pd.DataFrame(dataset, columns=COLUMNS)
+        write_partitioned_dataset([df], output_dir, file_format)
+        print(f"Dataset saved: {len(df)} total entries partitioned by level and topic in {output_dir}/")
+        return df
     
     if separate_files:
         # Save separate files for each level
         df_all = pd.DataFrame(dataset)
         
-        for level in range(1, 6):
-            level_data = df_all[df_all['level'] == level]
+        for level, level_data in df_all.groupby('level', sort=True):
             filename = f'indonesian_literacy_level_{level}.csv'
             level_data.to_csv(filename, index=False, encoding='utf-8')
             print(f"Level {level}: {len(level_data)} entries saved to {filename}")
@@ -283,25 +1264,363 @@ def save_dataset(dataset, separate_files=False):
         
         return df
 
-if __name__ == "__main__":
-    print("Generating Indonesian Literacy Dataset...")
-    dataset = create_indonesian_literacy_dataset()
+# Bump when a code change alters the rows generated for the same inputs,
+# so partitions cached by older versions are no longer reused
+CACHE_VERSION = 2
+
+# Default bound on the on-disk size of a partition cache
+DEFAULT_CACHE_BYTES = 1024 * 2 ** 20
+
+def partition_cache_key(level, questions_per_topic, seed, batch_size=DEFAULT_BATCH_SIZE, unique=False, file_format='csv'):
+    """Content hash of everything that determines a generated level partition
+    
+    A level's rows only depend on its own template configuration, the
+    distractor rules, the columns and shard seeds keyed by level, so
+    editing one level leaves the keys of the other levels unchanged.
+    """
+    
+    inputs = {
+        'version': CACHE_VERSION,
+        'level': level,
+        'templates': TEMPLATES[level],
+        'columns': COLUMNS,
+        # The rule lists and the tables compiled from them, in case only one is replaced
+        'negation_rules': [NEGATION_RULES, NEGATION_TABLE.rules],
+        'word_swap_rules': [WORD_SWAP_RULES, WORD_SWAP_TABLE.rules],
+        'questions_per_topic': questions_per_topic,
+        'seed': seed,
+        'batch_size': batch_size,
+        'unique': unique,
+        'format': file_format
+    }
+    encoded = json.dumps(inputs, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+def path_size(path):
+    """Size in bytes of a file, or of every file below a directory"""
+    if not os.path.isdir(path):
+        return os.path.getsize(path)
+    return sum(
+        os.path.getsize(os.path.join(directory, name))
+        for directory, _, names in os.walk(path)
+        for name in names
+    )
+
+def remove_path(path):
+    """Delete a file or a directory tree"""
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    else:
+        os.remove(path)
+
+class PartitionCache:
+    """Content-addressed on-disk cache of generated level partitions
+    
+    Entries are files (or directories) named after their key. Using an
+    entry refreshes its modification time, and the least recently used
+    entries are evicted once the cache grows past max_bytes.
+    """
+    
+    __slots__ = ('root', 'max_bytes')
+    
+    def __init__(self, root, max_bytes=DEFAULT_CACHE_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        os.makedirs(root, exist_ok=True)
+    
+    def entry_path(self, key, suffix=''):
+        return os.path.join(self.root, key + suffix)
     
-    print(f"\nGenerated {len(dataset)} total entries")
+    def get(self, key, suffix=''):
+        """Path of a cached entry, or None when it is missing"""
+        path = self.entry_path(key, suffix)
+        if not os.path.exists(path):
+            return None
+        os.utime(path)
+        return path
     
-    choice = input("Save as separate files per level? (y/n): ").lower().strip()
-    separate = choice in ['y', 'yes', '1', 'true']
+    def put(self, key, suffix, write):
+        """Store an entry by calling write(temporary path), return the entry path
+        
+        The entry only appears once write has finished, so an interrupted
+        run never leaves a partial partition behind.
+        """
+        
+        path = self.entry_path(key, suffix)
+        temporary = os.path.join(self.root, f'.tmp-{os.getpid()}-{key}{suffix}')
+        if os.path.exists(temporary):
+            remove_path(temporary)
+        
+        try:
+            write(temporary)
+            os.replace(temporary, path)
+        finally:
+            if os.path.exists(temporary):
+                remove_path(temporary)
+        
+        return path
     
-    df = save_dataset(dataset, separate_files=separate)
+    def evict(self, keep=()):
+        """Delete least recently used entries until the cache fits in max_bytes"""
+        
+        keep = set(keep)
+        entries = []
+        for name in os.listdir(self.root):
+            if name.startswith('.tmp-'):
+                continue
+            path = os.path.join(self.root, name)
+            entries.append((os.path.getmtime(path), path_size(path), path))
+        
+        total = sum(size for _, size, _ in entries)
+        evicted = []
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if path in keep:
+                continue
+            remove_path(path)
+            total -= size
+            evicted.append(path)
+        
+        return evicted
+
+def dataset_output_path(output_dir, output_format, level=None):
+    """Where the CLI writes a dataset, or a single level of it"""
+    if output_format in ('partitioned', 'arrow'):
+        return os.path.join(output_dir, 'indonesian_literacy_dataset')
+    if output_format == 'compact':
+        return os.path.join(output_dir, 'indonesian_literacy_dataset.npz')
+    if level is not None:
+        return os.path.join(output_dir, f'indonesian_literacy_level_{level}.{output_format}')
+    return os.path.join(output_dir, f'indonesian_literacy_dataset.{output_format}')
+
+def write_level_partition(path, output_format, level, questions_per_topic, seed, batch_size=DEFAULT_BATCH_SIZE, unique=False, workers=1, profiler=None):
+    """Generate one level and write it to path, return the row count"""
     
-    if not separate:
-        print(f"\nSample entries:")
-        for level in [1, 3, 5]:
-            sample = df[df['level'] == level].iloc[0]
-            print(f"\n--- Level {level} Sample ---")
-            print(f"Topic: {sample['topic']}")
-            print(f"Text: {sample['text'][:100]}...")
-            print(f"Summary: {sample['correct_summary']}")
-            print(f"Word count: {sample['word_count']}")
+    if output_format in ('partitioned', 'arrow'):
+        batches = iter_literacy_batches(
+            questions_per_topic, (level,), batch_size, seed,
+            vectorized=True, workers=workers, unique=unique, profiler=profiler
+        )
+        file_format = 'parquet' if output_format == 'partitioned' else 'arrow'
+        return write_partitioned_dataset(batches, path, file_format, profiler=profiler)
     
-    print("\nDataset generation complete!")
\ No newline at end of file
+    encoded = iter_encoded_batches(questions_per_topic, (level,), batch_size, seed, workers, unique, output_format, profiler=profiler)
+    return write_encoded_stream(encoded, path, output_format, profiler)
+
+def assemble_partitions(entries, output_path, output_format):
+    """Combine cached level partitions into one output, without regenerating them"""
+    
+    if output_format in ('partitioned', 'arrow'):
+        os.makedirs(output_path, exist_ok=True)
+        for level, entry in entries:
+            target = os.path.join(output_path, f'level={level}')
+            if os.path.exists(target):
+                shutil.rmtree(target)
+            shutil.copytree(os.path.join(entry, f'level={level}'), target)
+        return
+    
+    if output_format == 'csv':
+        remove_index(output_path)
+        with open(output_path, 'wb') as output:
+            for i, (_, entry) in enumerate(entries):
+                with open(entry, 'rb') as f:
+                    header = f.readline()
+                    if i == 0:
+                        output.write(header)
+                    shutil.copyfileobj(f, output)
+        return
+    
+    import pyarrow.parquet as pq
+    
+    writer = None
+    try:
+        for _, entry in entries:
+            parquet_file = pq.ParquetFile(entry)
+            if writer is None:
+                writer = pq.ParquetWriter(output_path, parquet_file.schema_arrow)
+            for row_group in range(parquet_file.num_row_groups):
+                writer.write_table(parquet_file.read_row_group(row_group))
+    finally:
+        if writer is not None:
+            writer.close()
+
+def write_cached_dataset(cache, output_dir, output_format, questions_per_topic, levels, seed, batch_size=DEFAULT_BATCH_SIZE, unique=False, workers=1, separate_files=False, profiler=None):
+    """Write the dataset, regenerating only levels whose cache key is not cached yet
+    
+    Returns (output path, row count, levels that were regenerated).
+    """
+    
+    if seed is None:
+        raise ValueError("Caching needs a fixed seed, otherwise every run generates different rows")
+    if output_format == 'compact':
+        raise ValueError("Compact datasets are not cached; they are cheap to sample")
+    if separate_files and output_format not in ('csv', 'parquet'):
+        raise ValueError(f"Separate files per level are only written for csv and parquet, not {output_format}")
+    
+    os.makedirs(output_dir, exist_ok=True)
+    suffix = '' if output_format in ('partitioned', 'arrow') else f'.{output_format}'
+    entries = []
+    regenerated = []
+    total = 0
+    
+    for level in levels:
+        key = partition_cache_key(level, questions_per_topic, seed, batch_size, unique, output_format)
+        entry = cache.get(key, suffix)
+        if entry is None:
+            regenerated.append(level)
+            entry = cache.put(key, suffix, lambda path, level=level: write_level_partition(
+                path, output_format, level, questions_per_topic, seed, batch_size, unique, workers, profiler
+            ))
+        entries.append((level, entry))
+        total += questions_per_topic * len(TEMPLATES[level]["topics"])
+    
+    with profile_stage(profiler, 'cache'):
+        if separate_files:
+            for level, entry in entries:
+                shutil.copyfile(entry, dataset_output_path(output_dir, output_format, level))
+            output_path = output_dir
+        else:
+            output_path = dataset_output_path(output_dir, output_format)
+            assemble_partitions(entries, output_path, output_format)
+    
+    cache.evict(keep=[entry for _, entry in entries])
+    return output_path, total, regenerated
+
+OUTPUT_FORMATS = ('csv', 'parquet', 'partitioned', 'arrow', 'compact')
+
+def parse_levels(value):
+    """Parse a comma-separated list of levels such as 1,3,5"""
+    try:
+        levels = tuple(int(item) for item in value.split(',') if item)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid level list: {value}")
+    unknown = [level for level in levels if level not in TEMPLATES]
+    if not levels or unknown:
+        raise argparse.ArgumentTypeError(f"levels must be a subset of {','.join(map(str, LEVELS))}")
+    if len(set(levels)) != len(levels):
+        raise argparse.ArgumentTypeError(f"levels are listed more than once: {value}")
+    return levels
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Generate the Indonesian literacy question dataset")
+    
+    count = parser.add_mutually_exclusive_group()
+    count.add_argument('--per-topic', type=int, help="questions per topic (default 10)")
+    count.add_argument('--per-level', type=int, help="questions per level, a multiple of its topic count")
+    
+    parser.add_argument('--levels', type=parse_levels, default=LEVELS, help="comma-separated levels to generate (default all)")
+    parser.add_argument('--seed', type=int, help="master seed; the same seed gives the same output for any worker count")
+    parser.add_argument('--workers', type=int, default=1, help="worker processes, 0 for one per CPU (default 1)")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help="rows per shard and write batch")
+    parser.add_argument('--unique', action='store_true', help="never repeat an item within a level")
+    parser.add_argument('--format', choices=OUTPUT_FORMATS, default='csv', help="output format (default csv)")
+    parser.add_argument('--output-dir', default='.', help="directory the dataset is written to")
+    parser.add_argument('--separate-files', action='store_true', help="csv or parquet: write one file per level")
+    parser.add_argument('--profile', action='store_true', help="report wall time and allocated memory per stage")
+    parser.add_argument('--capacity', action='store_true', help="print the combination capacity of every template and exit")
+    parser.add_argument('--index', action='store_true', help="csv only: also write a sampling index by level, topic and difficulty")
+    parser.add_argument('--cache-dir', help="reuse level partitions cached here whose templates, seed and count are unchanged")
+    parser.add_argument('--cache-max-mb', type=int, default=DEFAULT_CACHE_BYTES // 2 ** 20, help="evict least recently used partitions above this size")
+    return parser
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    
+    if args.cache_dir and args.seed is None:
+        parser.error("--cache-dir requires --seed")
+    if args.cache_dir and args.format == 'compact':
+        parser.error("--cache-dir does not apply to --format compact")
+    if args.separate_files and args.format not in ('csv', 'parquet'):
+        parser.error("--separate-files needs --format csv or parquet")
+    if args.index and (args.format != 'csv' or args.separate_files):
+        parser.error("--index needs --format csv without --separate-files")
+    
+    if args.per_topic is not None and args.per_topic < 1:
+        parser.error("--per-topic must be at least 1")
+    if args.batch_size < 1:
+        parser.error("--batch-size must be at least 1")
+    
+    if args.capacity:
+        print(template_capacity_report(args.levels).to_string(index=False))
+        return 0
+    
+    if args.per_level is not None:
+        topic_counts = {len(TEMPLATES[level]["topics"]) for level in args.levels}
+        if len(topic_counts) > 1:
+            parser.error("--per-level needs levels with the same number of topics; use --per-topic")
+        topics = topic_counts.pop()
+        if args.per_level < topics or args.per_level % topics:
+            parser.error(f"--per-level must be a positive multiple of the {topics} topics per level")
+        questions_per_topic = args.per_level // topics
+    elif args.per_topic is not None:
+        questions_per_topic = args.per_topic
+    else:
+        questions_per_topic = 10
+    
+    profiler = None
+    if args.profile:
+        profiler = StageProfiler()
+        tracemalloc.start()
+    
+    os.makedirs(args.output_dir, exist_ok=True)
+    options = dict(
+        batch_size=args.batch_size, seed=args.seed,
+        workers=args.workers, unique=args.unique, profiler=profiler
+    )
+    
+    print("Generating Indonesian Literacy Dataset...")
+    started = time.perf_counter()
+    
+    if args.cache_dir:
+        cache = PartitionCache(args.cache_dir, args.cache_max_mb * 2 ** 20)
+        path, total, regenerated = write_cached_dataset(
+            cache, args.output_dir, args.format, questions_per_topic, args.levels, args.seed,
+            args.batch_size, args.unique, args.workers, args.separate_files, profiler
+        )
+        for level in args.levels:
+            print(f"Level {level}: {'regenerated' if level in regenerated else 'reused from cache'}")
+        if args.index:
+            with profile_stage(profiler, 'index'):
+                build_sampling_index(path)
+    elif args.format == 'compact':
+        path = dataset_output_path(args.output_dir, 'compact')
+        with profile_stage(profiler, 'sampling'):
+            dataset = generate_compact_dataset(questions_per_topic, args.levels, args.seed, args.unique, args.batch_size)
+        with profile_stage(profiler, 'write'):
+            dataset.save(path)
+        total = len(dataset)
+    elif args.format in ('partitioned', 'arrow'):
+        path = dataset_output_path(args.output_dir, args.format)
+        batches = iter_literacy_batches(questions_per_topic, args.levels, vectorized=True, **options)
+        file_format = 'parquet' if args.format == 'partitioned' else 'arrow'
+        total = write_partitioned_dataset(batches, path, file_format, profiler=profiler)
+    elif args.separate_files:
+        total = 0
+        for level in args.levels:
+            path = dataset_output_path(args.output_dir, args.format, level)
+            encoded = iter_encoded_batches(questions_per_topic, (level,), file_format=args.format, **options)
+            written = write_encoded_stream(encoded, path, args.format, profiler)
+            print(f"Level {level}: {written} entries saved to {path}")
+            total += written
+        path = args.output_dir
+    else:
+        path = dataset_output_path(args.output_dir, args.format)
+        encoded = iter_encoded_batches(questions_per_topic, args.levels, file_format=args.format, index=args.index, **options)
+        total = write_encoded_stream(encoded, path, args.format, profiler, index=args.index)
+    
+    elapsed = time.perf_counter() - started
+    print(f"Generated {total} total entries in {elapsed:.2f}s -> {path}")
+    
+    if profiler is not None:
+        tracemalloc.stop()
+        if args.workers != 1:
+            print("\nStage times are summed over worker processes; write, index and cache run in the parent alone")
+        print("\nStage profile:")
+        print(profiler.report(elapsed))
+    
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,288 @@
+import csv
+import json
+import math
+import os
+
+import numpy as np
+import pandas as pd
+
+INDEX_VERSION = 3
+
+# Width of a difficulty_score bucket; the unit of stratify='bucket'
+DEFAULT_BUCKET_WIDTH = 0.1
+
+INTEGER_COLUMNS = ('level', 'word_count', 'sentence_count')
+FLOAT_COLUMNS = ('difficulty_score',)
+
+def index_paths(data_path):
+    """Header, offsets and scores file of the index belonging to a CSV dataset"""
+    return f'{data_path}.index.json', f'{data_path}.index.npy', f'{data_path}.index.scores.npy'
+
+def data_signature(data_path):
+    """Size and modification time that tie an index to one version of its data file"""
+    stat = os.stat(data_path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+def remove_index(data_path):
+    """Delete the index files of a CSV dataset, if there are any"""
+    for path in index_paths(data_path):
+        if os.path.exists(path):
+            os.remove(path)
+
+def difficulty_bucket(difficulty, bucket_width=DEFAULT_BUCKET_WIDTH):
+    """Bucket number of a difficulty score, or of an array of them"""
+    # Round first so scores such as 2.3 do not land one bucket low
+    return np.floor(np.round(np.asarray(difficulty, dtype=np.float64) / bucket_width, 9)).astype(np.int64)
+
+def line_offsets(data, base=0):
+    """Byte offset of every line start in a block of CSV bytes"""
+    newlines = np.flatnonzero(np.frombuffer(data, dtype=np.uint8) == ord('\n'))
+    return base + np.concatenate(([0], newlines[:-1] + 1)).astype(np.uint64)
+
+class SamplingIndexBuilder:
+    """Collects (level, topic, difficulty, byte offset) of rows as they are written"""
+
+    __slots__ = ('bucket_width', 'topics', 'levels', 'topic_ids', 'scores', 'offsets')
+
+    def __init__(self, bucket_width=DEFAULT_BUCKET_WIDTH):
+        self.bucket_width = bucket_width
+        self.topics = {}
+        self.levels = []
+        self.topic_ids = []
+        self.scores = []
+        self.offsets = []
+
+    def add_batch(self, batch, offsets):
+        """Record the rows of a written batch and the byte offsets they start at"""
+
+        if len(offsets) != len(batch):
+            raise ValueError(f"Got {len(offsets)} row offsets for a batch of {len(batch)} rows")
+
+        topic_ids = [self.topics.setdefault(topic, len(self.topics)) for topic in batch['topic']]
+        self.levels.append(batch['level'].to_numpy(dtype=np.uint8))
+        self.topic_ids.append(np.array(topic_ids, dtype=np.uint16))
+        self.scores.append(batch['difficulty_score'].to_numpy(dtype=np.float64))
+        self.offsets.append(np.asarray(offsets, dtype=np.uint64))
+
+    def write(self, data_path, columns):
+        """Write the index next to data_path, grouping offsets by (level, topic, bucket)
+
+        Within a group rows are ordered by difficulty score, which is saved
+        alongside the offsets so range queries can trim the edge buckets.
+        """
+
+        header_path, offsets_path, scores_path = index_paths(data_path)
+
+        levels = np.concatenate(self.levels) if self.levels else np.zeros(0, dtype=np.uint8)
+        topic_ids = np.concatenate(self.topic_ids) if self.topic_ids else np.zeros(0, dtype=np.uint16)
+        scores = np.concatenate(self.scores) if self.scores else np.zeros(0, dtype=np.float64)
+        offsets = np.concatenate(self.offsets) if self.offsets else np.zeros(0, dtype=np.uint64)
+        buckets = difficulty_bucket(scores, self.bucket_width)
+
+        # Stable sort keeps rows of equal score in file order
+        order = np.lexsort((scores, buckets, topic_ids, levels))
+        levels, topic_ids, buckets = levels[order], topic_ids[order], buckets[order]
+        np.save(offsets_path, offsets[order])
+        np.save(scores_path, scores[order])
+
+        starts = np.flatnonzero(
+            np.concatenate(([True], (levels[1:] != levels[:-1]) | (topic_ids[1:] != topic_ids[:-1]) | (buckets[1:] != buckets[:-1])))
+        ) if len(levels) else np.zeros(0, dtype=np.int64)
+        counts = np.diff(np.append(starts, len(levels)))
+
+        topic_names = {topic_id: topic for topic, topic_id in self.topics.items()}
+        groups = [
+            [int(levels[start]), topic_names[int(topic_ids[start])], int(buckets[start]), int(start), int(count)]
+            for start, count in zip(starts, counts)
+        ]
+
+        with open(header_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'version': INDEX_VERSION,
+                'data': os.path.basename(data_path),
+                'columns': list(columns),
+                'bucket_width': self.bucket_width,
+                'rows': int(len(offsets)),
+                'signature': data_signature(data_path),
+                'groups': groups
+            }, f, ensure_ascii=False)
+
+        return header_path
+
+def build_sampling_index(data_path, bucket_width=DEFAULT_BUCKET_WIDTH, chunksize=100000):
+    """Build the index of an existing CSV dataset in one streaming pass
+
+    Rows must not contain embedded newlines, which holds for the generated
+    dataset; each line after the header is one row.
+    """
+
+    builder = SamplingIndexBuilder(bucket_width)
+
+    with open(data_path, 'rb') as f:
+        columns = next(csv.reader([f.readline().decode('utf-8')]))
+        position = f.tell()
+
+        chunks = pd.read_csv(data_path, usecols=['level', 'topic', 'difficulty_score'], chunksize=chunksize)
+        for chunk in chunks:
+            offsets = np.zeros(len(chunk), dtype=np.uint64)
+            for i in range(len(chunk)):
+                offsets[i] = position
+                position += len(f.readline())
+            builder.add_batch(chunk, offsets)
+
+    builder.write(data_path, columns)
+    return index_paths(data_path)[0]
+
+class QuestionIndex:
+    """Memory-mapped index for drawing questions without loading the dataset
+
+    Offsets are grouped by (level, topic, difficulty bucket) and sorted by
+    score within a group; a query touches only the matching groups, trims
+    the edge buckets by binary search and reads just the k selected rows.
+    """
+
+    __slots__ = ('data_path', 'columns', 'bucket_width', 'groups', 'offsets', 'scores')
+
+    def __init__(self, header_path):
+        with open(header_path, encoding='utf-8') as f:
+            header = json.load(f)
+        if header['version'] != INDEX_VERSION:
+            raise ValueError(f"Unsupported index version {header['version']} in {header_path}")
+
+        self.data_path = os.path.join(os.path.dirname(header_path), header['data'])
+        if header['signature'] != data_signature(self.data_path):
+            raise ValueError(f"Index {header_path} is stale: {self.data_path} changed after it was built")
+        self.columns = header['columns']
+        self.bucket_width = header['bucket_width']
+        self.groups = [tuple(group) for group in header['groups']]
+        base_path = header_path[:-len('.json')]
+        self.offsets = np.load(base_path + '.npy', mmap_mode='r')
+        self.scores = np.load(base_path + '.scores.npy', mmap_mode='r')
+
+    @classmethod
+    def for_dataset(cls, data_path):
+        """Open the index written next to a CSV dataset"""
+        return cls(index_paths(data_path)[0])
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def matching_groups(self, level=None, topic=None, min_difficulty=None, max_difficulty=None):
+        """Groups (level, topic, bucket, start, count) that match a query
+
+        Difficulty bounds are inclusive. Buckets at either end of the range
+        are narrowed to the rows whose score lies within it.
+        """
+
+        low = -math.inf if min_difficulty is None else int(difficulty_bucket(min_difficulty, self.bucket_width))
+        high = math.inf if max_difficulty is None else int(difficulty_bucket(max_difficulty, self.bucket_width))
+
+        groups = []
+        for group in self.groups:
+            group_level, group_topic, bucket, start, count = group
+            if level is not None and group_level != level:
+                continue
+            if topic is not None and group_topic != topic:
+                continue
+            if not low <= bucket <= high:
+                continue
+
+            if bucket in (low, high):
+                scores = self.scores[start:start + count]
+                first = 0 if min_difficulty is None else int(np.searchsorted(scores, min_difficulty, side='left'))
+                last = count if max_difficulty is None else int(np.searchsorted(scores, max_difficulty, side='right'))
+                if last <= first:
+                    continue
+                group = (group_level, group_topic, bucket, start + first, last - first)
+            groups.append(group)
+
+        return groups
+
+    def count(self, **query):
+        """Number of rows matching a query"""
+        return sum(group[4] for group in self.matching_groups(**query))
+
+    def sample(self, k, level=None, topic=None, min_difficulty=None, max_difficulty=None, stratify=None, seed=None):
+        """Return k distinct random rows matching the query as dicts
+
+        stratify='topic' or 'bucket' spreads the k rows as evenly as
+        possible over the matching topics or difficulty buckets.
+        """
+
+        rng = np.random.default_rng(seed)
+        groups = self.matching_groups(level, topic, min_difficulty, max_difficulty)
+
+        if stratify is None:
+            strata = [groups]
+        elif stratify in ('topic', 'bucket'):
+            field = 1 if stratify == 'topic' else 2
+            by_stratum = {}
+            for group in groups:
+                by_stratum.setdefault(group[field], []).append(group)
+            strata = list(by_stratum.values())
+        else:
+            raise ValueError(f"Unsupported stratification: {stratify}")
+
+        sizes = [sum(group[4] for group in stratum) for stratum in strata]
+        if k > sum(sizes):
+            raise ValueError(f"Only {sum(sizes)} questions match, {k} requested")
+
+        offsets = []
+        for stratum, take in zip(strata, allocate_evenly(k, sizes)):
+            offsets.extend(self.sample_offsets(stratum, take, rng))
+
+        rows = self.read_rows(offsets)
+        if stratify is not None:
+            rng.shuffle(rows)
+        return rows
+
+    def sample_offsets(self, groups, k, rng):
+        """Byte offsets of k distinct rows drawn uniformly from groups"""
+
+        if k == 0:
+            return []
+
+        counts = np.array([group[4] for group in groups], dtype=np.int64)
+        ends = np.cumsum(counts)
+        positions = rng.choice(int(ends[-1]), size=k, replace=False)
+
+        group_numbers = np.searchsorted(ends, positions, side='right')
+        starts = np.array([group[3] for group in groups], dtype=np.int64)
+        rows = starts[group_numbers] + positions - (ends[group_numbers] - counts[group_numbers])
+        return [int(self.offsets[row]) for row in rows]
+
+    def read_rows(self, offsets):
+        """Read the CSV rows starting at the given byte offsets, in that order"""
+
+        rows = {}
+        with open(self.data_path, 'rb') as f:
+            # Seek in file order so reads stay mostly sequential
+            for offset in sorted(set(offsets)):
+                f.seek(offset)
+                values = next(csv.reader([f.readline().decode('utf-8')]))
+                row = dict(zip(self.columns, values))
+                for column in INTEGER_COLUMNS:
+                    if column in row:
+                        row[column] = int(row[column])
+                for column in FLOAT_COLUMNS:
+                    if column in row:
+                        row[column] = float(row[column])
+                rows[offset] = row
+
+        return [rows[offset] for offset in offsets]
+
+def allocate_evenly(k, sizes):
+    """Split k draws over strata as evenly as their sizes allow"""
+
+    allocation = [0] * len(sizes)
+    remaining = k
+    open_strata = [i for i, size in enumerate(sizes) if size > 0]
+
+    while remaining and open_strata:
+        share, extra = divmod(remaining, len(open_strata))
+        for position, i in enumerate(open_strata):
+            allocation[i] += min(share + (position < extra), sizes[i] - allocation[i])
+        remaining = k - sum(allocation)
+        open_strata = [i for i in open_strata if allocation[i] < sizes[i]]
+
+    return allocation